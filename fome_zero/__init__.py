@@ -0,0 +1,40 @@
+from fome_zero.aggregates import TOP_VOTED, PartialAggregates
+from fome_zero.catalog import ColumnCatalog
+from fome_zero.charts import bar_chart, cap_bars
+from fome_zero.cleaning import dedup_report
+from fome_zero.figures import build_figures, cached_figure, chart_costs, chart_slot, figure_cache
+from fome_zero.loader import (CSV_PATH, apply_delta, clear_cache, load_aggregates, load_catalog, load_costs,
+                              load_dataset, load_geo_bins, load_quarantine)
+from fome_zero.outliers import OutlierScreen
+from fome_zero.ranking import bottom_k, top_k
+from fome_zero.schema import decategorize, memory_per_row
+from fome_zero.streaming import use_streaming
+
+__all__ = [
+    'CSV_PATH',
+    'ColumnCatalog',
+    'OutlierScreen',
+    'PartialAggregates',
+    'TOP_VOTED',
+    'apply_delta',
+    'bar_chart',
+    'bottom_k',
+    'build_figures',
+    'cached_figure',
+    'cap_bars',
+    'chart_costs',
+    'chart_slot',
+    'clear_cache',
+    'decategorize',
+    'dedup_report',
+    'figure_cache',
+    'load_aggregates',
+    'load_catalog',
+    'load_costs',
+    'load_dataset',
+    'load_geo_bins',
+    'load_quarantine',
+    'memory_per_row',
+    'top_k',
+    'use_streaming',
+]
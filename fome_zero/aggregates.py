@@ -0,0 +1,278 @@
+import pandas as pd
+
+from fome_zero.ranking import top_k
+from fome_zero.schema import decategorize
+
+# =========================================================================
+# Agregados parciais e combináveis (merge) usados pelos gráficos das páginas
+# =========================================================================
+
+#Cubo materializado no grão país x cidade x culinária x categoria de preço: os gráficos de países,
+#cidades e culinárias são respondidos somando células do cubo, sem voltar às linhas
+CUBE = 'cube'
+CUBE_KEYS = ['country_name', 'city', 'cuisines', 'price_category']
+
+#Grãos guardados: nome -> colunas de agrupamento
+GRAINS = {
+    CUBE: CUBE_KEYS,
+    'restaurant': ['restaurant_name'],
+}
+
+#Grãos obtidos por roll-up do cubo: nome -> colunas de agrupamento
+ROLLUPS = {
+    'country': ['country_name'],
+    'city': ['country_name', 'city'],
+    'cuisine': ['cuisines'],
+    'price_category': ['country_name', 'price_category'],
+}
+
+#Contagens distintas de cada roll-up; cuisines é uma dimensão do cubo e sai das próprias células
+ROLLUP_DISTINCT = {
+    'country': ['restaurant_name', 'cuisines'],
+    'city': ['restaurant_name', 'cuisines'],
+}
+
+#Contagens distintas guardadas junto do cubo, já contadas: roll-up -> colunas. As chaves desses roll-ups
+#começam pelo país, então um recorte por país (select) só filtra linhas, e cada tabela tem uma linha por
+#país ou cidade, seja qual for o número de restaurantes. O restaurant_id por país dá o total de
+#restaurantes da Home (um restaurante pertence a um país só).
+DISTINCT = {
+    'country': ['restaurant_name', 'restaurant_id'],
+    'city': ['restaurant_name'],
+}
+
+#Os restaurantes mais avaliados não são um grão: guardamos só as N linhas com mais votos,
+#com empates desfeitos pelo restaurant_id (o mesmo resultado com ou sem merge de blocos)
+TOP_VOTED = 'top_voted'
+TOP_VOTED_SIZE = 10
+TOP_VOTED_COLUMNS = ['restaurant_name', 'country_name', 'city', 'votes', 'restaurant_id']
+
+ALL_GRAINS = tuple(GRAINS) + (TOP_VOTED,)
+
+#Somas guardadas em cada célula de um grão
+SUM_COLUMNS = ['count', 'cost_sum', 'rating_sum', 'votes_sum']
+
+#Colunas lidas por from_frame: as consultas de linhas trazem só estas
+AGGREGATE_COLUMNS = list(dict.fromkeys(CUBE_KEYS + GRAINS['restaurant'] + ['average_cost_for_two_brl', 'aggregate_rating']
+                                       + TOP_VOTED_COLUMNS))
+
+#Troca os grãos de roll-up pelo cubo, sem repetir e mantendo a ordem
+def stored_grains(grains):
+    stored = [CUBE if grain in ROLLUPS else grain for grain in grains]
+    return tuple(dict.fromkeys(stored))
+
+def _sums(df, keys):
+    sums = df[keys + ['average_cost_for_two_brl', 'aggregate_rating', 'votes']].groupby(keys, observed=True).agg(
+        count=('aggregate_rating', 'size'),
+        cost_sum=('average_cost_for_two_brl', 'sum'),
+        rating_sum=('aggregate_rating', 'sum'),
+        votes_sum=('votes', 'sum'))
+    return decategorize(sums.reset_index())
+
+#Pares distintos (chaves do roll-up, hash do valor): o que se combina entre blocos para as contagens
+#distintas continuarem exatas. Só existem durante a agregação em blocos; finalize() os troca pelas contagens.
+def _distinct_pairs(df, keys, col):
+    pairs = df[keys].copy()
+    pairs['hash'] = pd.util.hash_array(df[col].to_numpy())
+    return decategorize(pairs.drop_duplicates().reset_index(drop=True))
+
+#Contagens de cada roll-up de DISTINCT a partir dos pares: roll-up -> DataFrame indexado pelas chaves
+def _count_pairs(pairs):
+    counts = {}
+    for grain, cols in DISTINCT.items():
+        keys = ROLLUPS[grain]
+        counts[grain] = pd.DataFrame({col: pairs[(grain, col)].groupby(keys).size() for col in cols})
+    return counts
+
+#Soma as contagens de frames de somas com as mesmas chaves e descarta o que zerou
+def _combine(frames, keys):
+    combined = pd.concat(frames).groupby(keys, sort=False).sum().reset_index()
+    return combined[combined['count'] != 0].reset_index(drop=True)
+
+def _top_voted(df):
+    top = top_k(df[TOP_VOTED_COLUMNS], 'votes', TOP_VOTED_SIZE, tie_break=['restaurant_id'])
+    return decategorize(top.reset_index(drop=True))
+
+def _stats(df):
+    return {
+        'rows': len(df),
+        'votes': int(df['votes'].sum()),
+        'cost_min': df['average_cost_for_two_brl'].min(),
+        'cost_max': df['average_cost_for_two_brl'].max(),
+        'rating_min': df['aggregate_rating'].min(),
+        'rating_max': df['aggregate_rating'].max(),
+    }
+
+def _merge_stats(a, b):
+    if a['rows'] == 0:
+        return dict(b)
+    if b['rows'] == 0:
+        return dict(a)
+    return {
+        'rows': a['rows'] + b['rows'],
+        'votes': a['votes'] + b['votes'],
+        'cost_min': min(a['cost_min'], b['cost_min']),
+        'cost_max': max(a['cost_max'], b['cost_max']),
+        'rating_min': min(a['rating_min'], b['rating_min']),
+        'rating_max': max(a['rating_max'], b['rating_max']),
+    }
+
+#Resultado parcial de um pedaço do dataset. Dois parciais se combinam com merge(), então o dataset
+#pode ser processado em blocos (ou em paralelo) sem nunca ficar inteiro na memória.
+#Um parcial não muda depois de criado (merge, update e select devolvem outro), então as tabelas
+#finais são calculadas uma vez e reaproveitadas por todos os gráficos e reruns que o usam.
+class PartialAggregates:
+
+    def __init__(self, grains, sums, distinct, top_voted, stats, pairs=None):
+        self.grains = grains
+        self.sums = sums
+        self.distinct = distinct
+        self.top_voted = top_voted
+        self.stats = stats
+        self.pairs = pairs
+        self._tables = {}
+
+    #Parcial de um bloco: com o cubo, guarda os pares distintos em vez das contagens, para o merge
+    @classmethod
+    def from_frame(cls, df, grains=ALL_GRAINS):
+        grains = stored_grains(grains)
+        sums = {}
+        for grain in grains:
+            if grain != TOP_VOTED:
+                sums[grain] = _sums(df, GRAINS[grain])
+        pairs = None
+        if CUBE in grains:
+            pairs = {(grain, col): _distinct_pairs(df, ROLLUPS[grain], col)
+                     for grain, cols in DISTINCT.items() for col in cols}
+        top_voted = _top_voted(df) if TOP_VOTED in grains else None
+        return cls(grains, sums, None, top_voted, _stats(df), pairs)
+
+    #Combina vários parciais de uma vez: cada tabela é reagrupada uma vez só, e não uma vez por merge
+    @classmethod
+    def combine(cls, partials):
+        first = partials[0]
+        for other in partials[1:]:
+            if other.grains != first.grains:
+                raise ValueError(f'grãos diferentes: {first.grains} x {other.grains}')
+            if other.distinct is not None or first.distinct is not None:
+                raise ValueError('parcial finalizado não se combina')
+
+        sums = {grain: _combine([p.sums[grain] for p in partials], GRAINS[grain]) for grain in first.sums}
+
+        pairs = None
+        if first.pairs is not None:
+            pairs = {key: pd.concat([p.pairs[key] for p in partials]).drop_duplicates().reset_index(drop=True)
+                     for key in first.pairs}
+
+        top_voted = None
+        if first.top_voted is not None:
+            top_voted = _top_voted(pd.concat([p.top_voted for p in partials]))
+
+        stats = first.stats
+        for other in partials[1:]:
+            stats = _merge_stats(stats, other.stats)
+        return cls(first.grains, sums, None, top_voted, stats, pairs)
+
+    def merge(self, other):
+        return PartialAggregates.combine([self, other])
+
+    #Agregado pronto para as páginas: os pares distintos viram contagens por país e cidade, e o que fica em
+    #cache tem tamanho fixo pelo número de células, não pelo de restaurantes
+    def finalize(self):
+        distinct = _count_pairs(self.pairs) if self.pairs is not None else self.distinct
+        return PartialAggregates(self.grains, self.sums, distinct, self.top_voted, self.stats)
+
+    #Atualização incremental quando restaurantes são substituídos: removed são as versões antigas das
+    #linhas, added as novas e current o recorte atual completo, usado só no que não é invertível
+    #(as contagens distintas, os N mais votados e os mínimos/máximos)
+    def update(self, removed, added, current):
+        removed = PartialAggregates.from_frame(removed, [g for g in self.grains if g != TOP_VOTED])
+        added = PartialAggregates.from_frame(added, [g for g in self.grains if g != TOP_VOTED])
+
+        sums = {}
+        for grain, frame in self.sums.items():
+            negative = removed.sums[grain].copy()
+            negative[SUM_COLUMNS] *= -1
+            sums[grain] = _combine([frame, negative, added.sums[grain]], GRAINS[grain])
+        distinct = None
+        if CUBE in self.grains:
+            distinct = _count_pairs({(grain, col): _distinct_pairs(current, ROLLUPS[grain], col)
+                                     for grain, cols in DISTINCT.items() for col in cols})
+
+        top_voted = _top_voted(current) if self.top_voted is not None else None
+        return PartialAggregates(self.grains, sums, distinct, top_voted, _stats(current))
+
+    #Recorte do cubo para uma lista de países, sem voltar às linhas: as células e as contagens distintas
+    #são filtradas pelo país. Os mínimos/máximos (stats) não têm país e ficam None.
+    def select(self, countries):
+        countries = list(countries)
+        sums = {CUBE: self.sums[CUBE].loc[self.sums[CUBE]['country_name'].isin(countries)].reset_index(drop=True)}
+        distinct = {grain: counts.loc[counts.index.get_level_values('country_name').isin(countries)]
+                    for grain, counts in self._counts().items()}
+        return PartialAggregates((CUBE,), sums, distinct, None, None)
+
+    def _counts(self):
+        if self.distinct is None:
+            self.distinct = _count_pairs(self.pairs)
+        return self.distinct
+
+    #Roll-up do cubo para as chaves de um grão de ROLLUPS: somas, contagem e culinárias distintas
+    #saem de um único groupby sobre as células
+    def _rollup(self, grain):
+        keys = ROLLUPS[grain]
+        distinct = ROLLUP_DISTINCT.get(grain, [])
+        agg = {'count': 'sum', 'cost_sum': 'sum', 'rating_sum': 'sum'}
+        if 'cuisines' in distinct:
+            agg['cuisines'] = 'nunique'
+        sums = self.sums[CUBE].groupby(keys).agg(agg)
+
+        result = pd.DataFrame(index=sums.index)
+        for col in distinct:
+            result[col] = sums['cuisines'] if col == 'cuisines' else self._counts()[grain][col]
+        result['average_cost_for_two_brl'] = sums['cost_sum'] / sums['count']
+        result['aggregate_rating'] = sums['rating_sum'] / sums['count']
+        result['size'] = sums['count']
+        return result
+
+    #Tabela final de um grão, no mesmo formato de df.groupby(chaves): nunique, médias e size.
+    #Os gráficos recebem fatias dessa tabela e não devem alterá-la in-place.
+    def table(self, grain):
+        if grain not in self._tables:
+            self._tables[grain] = self._rollup(grain) if grain in ROLLUPS else self._table(grain)
+        return self._tables[grain]
+
+    def _table(self, grain):
+        keys = GRAINS[grain]
+        sums = self.sums[grain].set_index(keys).sort_index()
+        result = pd.DataFrame(index=sums.index)
+        result['average_cost_for_two_brl'] = sums['cost_sum'] / sums['count']
+        result['aggregate_rating'] = sums['rating_sum'] / sums['count']
+        result['size'] = sums['count']
+        return result
+
+    def by_country(self):
+        return self.table('country')
+
+    def by_city(self):
+        return self.table('city')
+
+    def by_cuisine(self):
+        return self.table('cuisine')
+
+    def by_restaurant(self):
+        return self.table('restaurant')
+
+    #Formato de df.groupby(['country_name','price_category'], as_index=False).size()
+    def price_categories(self):
+        return self.table('price_category')[['size']].reset_index()
+
+    #Métricas gerais da Home, a partir do cubo
+    def totals(self):
+        cells = self.sums[CUBE]
+        return {
+            'restaurants': int(self._counts()['country']['restaurant_id'].sum()),
+            'votes': int(cells['votes_sum'].sum()),
+            'countries': cells['country_name'].nunique(),
+            'cities': cells['city'].nunique(),
+            'cuisines': cells['cuisines'].nunique(),
+        }
@@ -0,0 +1,72 @@
+import numpy as np
+
+# =========================================================================
+# Catálogo de estatísticas das colunas numéricas, para os limites dos widgets
+# =========================================================================
+
+#Colunas numéricas catalogadas
+CATALOG_COLUMNS = ['average_cost_for_two_brl', 'aggregate_rating', 'votes']
+
+#Quantis guardados de cada coluna (percentis 0 a 100); os demais são interpolados entre eles
+GRID = np.linspace(0.0, 1.0, 101)
+
+def _column_stats(values):
+    missing = np.isnan(values)
+    nulls = int(missing.sum())
+    values = values[~missing]
+    if len(values) == 0:
+        return {'count': 0, 'nulls': nulls, 'min': None, 'max': None, 'grid': None}
+    grid = np.quantile(values, GRID)
+    return {'count': len(values), 'nulls': nulls, 'min': grid[0], 'max': grid[-1], 'grid': grid}
+
+#Junta duas grades de quantis pela média das distribuições acumuladas, ponderada pelo número de linhas
+#de cada bloco. Exato para um bloco só; com vários blocos (modo em blocos) os quantis internos são
+#aproximados pela interpolação entre os percentis, min e max não.
+def _merge_column_stats(a, b):
+    if a['count'] == 0 or b['count'] == 0:
+        merged = dict(b if a['count'] == 0 else a)
+        merged['nulls'] = a['nulls'] + b['nulls']
+        return merged
+    count = a['count'] + b['count']
+    points = np.unique(np.concatenate([a['grid'], b['grid']]))
+    cdf = (a['count'] * np.interp(points, a['grid'], GRID, left=0.0, right=1.0)
+           + b['count'] * np.interp(points, b['grid'], GRID, left=0.0, right=1.0)) / count
+    grid = np.interp(GRID, cdf, points)
+    grid[0] = points[0]
+    grid[-1] = points[-1]
+    return {'count': count, 'nulls': a['nulls'] + b['nulls'], 'min': grid[0], 'max': grid[-1], 'grid': grid}
+
+#Mínimo, máximo, quantis e nulos de cada coluna do dataset inteiro, calculados uma vez por versão
+#dele. Os widgets leem os limites daqui em O(1) e eles não mudam com os outros filtros da página.
+#Como PartialAggregates, dois catálogos de blocos se combinam com merge().
+class ColumnCatalog:
+
+    def __init__(self, columns):
+        self.columns = columns
+
+    @classmethod
+    def from_frame(cls, df):
+        return cls({col: _column_stats(df[col].to_numpy(dtype=float)) for col in CATALOG_COLUMNS})
+
+    def merge(self, other):
+        return ColumnCatalog({col: _merge_column_stats(stats, other.columns[col])
+                              for col, stats in self.columns.items()})
+
+    def count(self, col):
+        return self.columns[col]['count']
+
+    def nulls(self, col):
+        return self.columns[col]['nulls']
+
+    def min(self, col):
+        return self.columns[col]['min']
+
+    def max(self, col):
+        return self.columns[col]['max']
+
+    #(mínimo, máximo) como float, no formato dos widgets
+    def bounds(self, col):
+        return float(self.min(col)), float(self.max(col))
+
+    def quantile(self, col, q):
+        return float(np.interp(q, GRID, self.columns[col]['grid']))
@@ -0,0 +1,106 @@
+import json
+import threading
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+import plotly.io as pio
+
+# =========================================================================
+# Fábrica de figuras: gráficos de barras a partir de templates montados uma vez por processo
+# =========================================================================
+
+_DATA_KEYS = ('x', 'y', 'customdata')
+
+#Orçamento de barras por gráfico: acima dele ficam as primeiras e o resto vira uma barra "Outras",
+#então o JSON enviado ao navegador não cresce com o número de cidades do export
+MAX_BARS = 150
+OTHERS_LABEL = 'Outras'
+
+#df já na ordem do gráfico. No balde, y é somado ou, com weights (ex.: 'size' para médias), vira a
+#média ponderada das linhas agrupadas; as demais colunas de texto recebem OTHERS_LABEL.
+#Barras não têm versão WebGL no plotly, então o limite de pontos é o que mantém a página leve.
+def cap_bars(df, y, limit=MAX_BARS, weights=None):
+    if len(df) <= limit:
+        return df
+    head = df.iloc[:limit - 1]
+    tail = df.iloc[limit - 1:]
+
+    others = {col: OTHERS_LABEL for col in df.columns if df[col].dtype == object}
+    if weights is None:
+        others[y] = tail[y].sum()
+    else:
+        others[weights] = tail[weights].sum()
+        others[y] = (tail[y] * tail[weights]).sum() / others[weights]
+    return pd.concat([head, pd.DataFrame([others], columns=df.columns)], ignore_index=True)
+
+#Layout e estilo do trace de um gráfico de barras, extraídos de um px.bar sobre uma amostra de uma
+#linha (com os mesmos update_traces/update_xaxes das páginas). Por requisição só x, y e customdata
+#são trocados e a figura é montada sem validação. A figura é a mesma do px.bar (fig.to_dict() igual,
+#conferido em tests/test_charts.py), mas o JSON não sai byte a byte igual: a ordem das chaves do layout muda.
+class BarTemplate:
+
+    def __init__(self, x, y, labels=None, color=None, text_auto=False, custom_data=None, height=None,
+                 traces=None, xaxes=None):
+        if color is not None and 'hovertemplate' not in (traces or {}):
+            #o hovertemplate padrão do px muda a cada grupo de cor
+            raise ValueError('gráficos com color precisam de um hovertemplate fixo em traces')
+        self.x = x
+        self.y = y
+        self.color = color
+        self.custom_data = custom_data
+
+        columns = [x] + ([color] if color is not None else []) + list(custom_data or [])
+        sample = pd.DataFrame({col: ['a'] for col in columns})
+        sample[y] = [1.0]
+        fig = px.bar(sample, x=x, y=y, color=color, labels=labels, text_auto=text_auto,
+                     custom_data=custom_data, height=height)
+        fig.update_traces(**(traces or {}))
+        fig.update_xaxes(**(xaxes or {}))
+
+        #o layout fica como dict: o go.Figure copia um dict bem mais rápido que um objeto Layout
+        self.layout = fig.layout.to_plotly_json()
+        self.trace = {key: value for key, value in fig.data[0].to_plotly_json().items() if key not in _DATA_KEYS}
+        self.colorway = list(fig.layout.template.layout.colorway)
+
+    def _trace(self, df, **style):
+        trace = dict(self.trace, x=df[self.x].to_numpy(), y=df[self.y].to_numpy(), **style)
+        if self.custom_data:
+            trace['customdata'] = np.column_stack([df[col].to_numpy() for col in self.custom_data])
+        return trace
+
+    def figure(self, df):
+        layout = self.layout
+        if self.color is None:
+            data = [self._trace(df)]
+        else:
+            #um trace por valor de color, na ordem de aparição, com as cores do template (como o px)
+            codes, values = pd.factorize(df[self.color])
+            data = []
+            for code, value in enumerate(values):
+                marker = dict(self.trace['marker'], color=self.colorway[code % len(self.colorway)])
+                data.append(self._trace(df[codes == code], name=value, legendgroup=value, offsetgroup=value,
+                                        marker=marker))
+            if not data:
+                #sem grupos o px não coloca título na legenda
+                layout = dict(layout, legend={key: value for key, value in layout['legend'].items() if key != 'title'})
+        return go.Figure(data=data, layout=layout, _validate=False)
+
+_templates = {}
+_lock = threading.Lock()
+
+#Mesmos argumentos do px.bar, mais os kwargs de update_traces (traces) e update_xaxes (xaxes).
+#O template de cada combinação de argumentos é montado na primeira chamada e reaproveitado.
+def bar_chart(df, x, y, labels=None, color=None, text_auto=False, custom_data=None, height=None,
+              traces=None, xaxes=None):
+    spec = dict(x=x, y=y, labels=labels, color=color, text_auto=text_auto, custom_data=custom_data,
+                height=height, traces=traces, xaxes=xaxes)
+    #o streamlit troca o template padrão do plotly ao ser importado
+    key = json.dumps([pio.templates.default, spec], sort_keys=True)
+    template = _templates.get(key)
+    if template is None:
+        template = BarTemplate(**spec)
+        with _lock:
+            _templates[key] = template
+    return template.figure(df)
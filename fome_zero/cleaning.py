@@ -0,0 +1,201 @@
+import threading
+
+import inflection
+import numpy as np
+import pandas as pd
+
+from fome_zero.fx import load_rates
+from fome_zero.schema import apply_schema
+
+# =========================================================================
+# Limpeza e enriquecimento do dataset da Zomato
+# =========================================================================
+
+#Aplica func uma vez por valor distinto (e não uma vez por linha) e espalha o resultado com indexação de array
+def map_unique(series, func):
+    codes, uniques = pd.factorize(series)
+    values = np.array([func(x) for x in uniques], dtype=object)
+    return pd.Series(values[codes], index=series.index, name=series.name)
+
+#Chave padrão da deduplicação (colunas do CSV original); code_cleaning, build_dataset e as cargas
+#recebem outra pelo parâmetro key. Linhas com a mesma chave são comparadas pelo digest do conteúdo das
+#demais colunas, menos 'Switch to order menu' (todos os valores são 0)
+DEDUP_KEY = ['Restaurant ID']
+
+#Contadores do processo: linhas repetidas removidas na construção do dataset (build_duplicates), linhas
+#repetidas dentro dos deltas (delta_duplicates) e linhas de deltas puladas por já estarem no dataset
+dedup_report = {'build_duplicates': 0, 'delta_duplicates': 0, 'already_ingested': 0}
+_report_lock = threading.Lock()
+
+#Cada construção do dataset (carga completa, paralela ou passada em blocos) grava o total dela no lugar
+#do anterior: as várias passadas sobre a mesma versão do export mostram as duplicatas do export, não a soma
+def record_build_duplicates(duplicates):
+    with _report_lock:
+        dedup_report['build_duplicates'] = duplicates
+
+#Linhas de um delta repetidas ou já ingeridas, somadas a cada delta aplicado
+def record_dedup(delta_duplicates=0, already_ingested=0):
+    with _report_lock:
+        dedup_report['delta_duplicates'] += delta_duplicates
+        dedup_report['already_ingested'] += already_ingested
+
+#O read_csv infere os tipos por bloco (shard, pedaço ou chunk): uma célula vazia faz a coluna inteira
+#virar float64 naquele bloco, e o hash de 5 difere do de 5.0. Os números são hasheados sempre como
+#float64, então a mesma linha tem o mesmo hash em qualquer bloco.
+def _hashable(df):
+    numeric = df.select_dtypes('number').columns
+    return df.astype({col: 'float64' for col in numeric})
+
+def key_hashes(df, key=DEDUP_KEY):
+    return pd.util.hash_pandas_object(_hashable(df[key]), index=False, categorize=False).to_numpy()
+
+def content_hashes(df, key=DEDUP_KEY):
+    content = df.drop(columns=key + ['Switch to order menu'], errors='ignore')
+    return pd.util.hash_pandas_object(_hashable(content), index=False, categorize=False).to_numpy()
+
+def _combine_hashes(keys, contents):
+    return keys * np.uint64(0x9E3779B97F4A7C15) ^ contents
+
+#Hash de cada linha (chave combinada com o digest do conteúdo), com o mesmo critério de duplicata de
+#code_cleaning, para deduplicar entre blocos, shards e cargas
+def row_hashes(df, key=DEDUP_KEY):
+    return _combine_hashes(key_hashes(df, key), content_hashes(df, key))
+
+#Linhas repetidas de df, menos a primeira ocorrência de cada uma. Só linhas com a mesma chave podem ser
+#iguais, então o digest do conteúdo (endereços e outros textos longos) é calculado apenas nas linhas
+#cuja chave aparece mais de uma vez
+def duplicated_rows(df, key=DEDUP_KEY):
+    keys = key_hashes(df, key)
+    candidates = np.flatnonzero(pd.Series(keys).duplicated(keep=False).to_numpy())
+    duplicated = np.zeros(len(df), dtype=bool)
+    if len(candidates):
+        hashes = _combine_hashes(keys[candidates], content_hashes(df.iloc[candidates], key))
+        duplicated[candidates] = pd.Series(hashes).duplicated().to_numpy()
+    return duplicated
+
+#Versão do pipeline de limpeza: incrementar sempre que a saída de build_dataset mudar,
+#para invalidar os snapshots gravados em disco
+PIPELINE_VERSION = 4
+
+def code_cleaning(df, key=DEDUP_KEY):
+
+    #removendo linhas vazias
+    df = df.dropna()
+    
+    #removendo a coluna 'Switch to order menu' (todos os valores são 0 e não há descrição da coluna)
+    df = df.drop(['Switch to order menu'], axis=1)
+    
+    #removendo linhas duplicadas
+    df = df.loc[~duplicated_rows(df, key)].reset_index(drop=True)
+    
+    #categorizando os restaurantes somente pela primeira categoria informada
+    df['Cuisines'] = map_unique(df['Cuisines'], lambda x: x.split(',')[0])
+
+    return df
+
+#Preenchimento do nome dos países
+country_dict = {
+    1: "India",
+    14: "Australia",
+    30: "Brazil",
+    37: "Canada",
+    94: "Indonesia",
+    148: "New Zeland",
+    162: "Philippines",
+    166: "Qatar",
+    184: "Singapure",
+    189: "South Africa",
+    191: "Sri Lanka",
+    208: "Turkey",
+    214: "United Arab Emirates",
+    215: "England",
+    216: "United States of America",
+}
+
+#Criação do Tipo de Categoria de Comida (price range 1, 2 e 3; qualquer outro valor é Gourmet)
+price_type_table = np.array(['Gourmet', 'Cheap', 'Normal', 'Expensive'], dtype=object)
+
+def create_price_type(price_range):
+    price_range = np.asarray(price_range)
+    position = np.where((price_range >= 1) & (price_range <= 3), price_range, 0)
+    return price_type_table[position]
+
+#Criação do nome das Cores
+color_dict = {
+    "3F7E00": "darkgreen",
+    "5BA829": "green",
+    "9ACD32": "lightgreen",
+    "CDD614": "orange",
+    "FFBA00": "red",
+    "CBCBC8": "darkred",
+    "FF7800": "darkred",
+}
+
+#Renomear as colunas do DataFrame (um novo DataFrame sobre os mesmos dados, sem copiar as colunas)
+def rename_columns(df):
+    title = lambda x: inflection.titleize(x)
+    snakecase = lambda x: inflection.underscore(x)
+    spaces = lambda x: x.replace(" ", "")
+    cols_old = list(df.columns)
+    cols_old = list(map(title, cols_old))
+    cols_old = list(map(spaces, cols_old))
+    cols_new = list(map(snakecase, cols_old))
+    return df.set_axis(cols_new, axis=1, copy=False)
+
+#Erro com todos os códigos desconhecidos encontrados no dataset, agrupados por coluna
+class UnknownCodeError(KeyError):
+
+    def __init__(self, unknown):
+        self.unknown = unknown
+        details = '; '.join(f'{col}: {values}' for col, values in unknown.items())
+        super().__init__(f'códigos sem mapeamento -> {details}')
+
+#Busca vetorizada em tabela: devolve a coluna mapeada e a lista de códigos sem correspondência
+def lookup(codes, table):
+    positions, uniques = pd.factorize(codes)
+    values = pd.Series(uniques).map(table)
+    unknown = sorted(uniques[values.isna().to_numpy()].tolist())
+    mapped = pd.Series(values.to_numpy()[positions], index=codes.index)
+    return mapped, unknown
+
+#Colunas derivadas de tabelas de referência; códigos desconhecidos são reportados juntos, no fim
+def enrich(df):
+    unknown = {}
+
+    df['Country Name'], unknown['Country Code'] = lookup(df['Country Code'], country_dict)
+
+    df['Price Category'] = create_price_type(df['Price range'])
+
+    df['Rating Color Name'], unknown['Rating color'] = lookup(df['Rating color'], color_dict)
+
+    #a conversão para BRL é feita na carga (fx.py); aqui só as moedas sem cotação são reportadas
+    _, unknown['Currency'] = lookup(df['Currency'], load_rates().factors())
+
+    unknown = {col: values for col, values in unknown.items() if values}
+    if unknown:
+        raise UnknownCodeError(unknown)
+
+    return df
+
+#Pipeline completo: limpeza, colunas derivadas e renomeação
+def build_dataset(df, key=DEDUP_KEY):
+
+    #code_cleaning descarta as linhas incompletas e as repetidas: o que falta das completas são as duplicatas
+    complete = int(df.notna().all(axis=1).sum())
+    df = code_cleaning(df, key)
+    record_build_duplicates(complete - len(df))
+
+    df = enrich(df)
+
+    df = rename_columns(df)
+
+    return finalize_dataset(df)
+
+#Schema compacto do dataset limpo. Os outliers de preço (ex.: mais de R$123mi para duas pessoas) são
+#triados depois, em outliers.py, sobre o dataset final com os deltas
+def finalize_dataset(df):
+
+    #dtypes compactos (categóricos, inteiros estreitos) definidos em schema.py
+    df = apply_schema(df)
+
+    return df
@@ -0,0 +1,67 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from fome_zero.cleaning import DEDUP_KEY, key_hashes, record_dedup, row_hashes
+from fome_zero.deltas import delta_base, delta_files, prepare_delta_dir, seen_path
+from fome_zero.sources import file_hash, source_files
+from fome_zero.streaming import CHUNKSIZE
+
+# =========================================================================
+# Linhas já ingeridas de um export, para pular o que uma carga incremental repete
+# =========================================================================
+
+#Hash da chave e hash da linha inteira de cada linha do export base e dos deltas aplicados, com só a
+#versão mais recente de cada chave (como o upsert do dataset). Fica em disco junto dos deltas, então
+#um delta reenviado ou com linhas iguais às atuais não é limpo, gravado nem reaplicado.
+class SeenRows:
+
+    def __init__(self, keys, rows, base_hash):
+        self.keys = keys
+        self.rows = rows
+        self.base_hash = base_hash
+
+    #Linhas de df que ainda não estão no dataset: a última de cada chave (a que o delta aplicaria),
+    #se a linha inteira for diferente da versão atual. As demais são contadas em dedup_report.
+    def new_rows(self, df, key=DEDUP_KEY):
+        last = df.loc[~df.duplicated(key, keep='last').to_numpy()]
+        new = last.loc[~np.isin(row_hashes(last, key), self.rows)]
+        record_dedup(delta_duplicates=len(df) - len(last), already_ingested=len(last) - len(new))
+        return new
+
+    #As linhas de df substituem as versões anteriores das mesmas chaves
+    def upsert(self, df, key=DEDUP_KEY):
+        df = df.loc[~df.duplicated(key, keep='last').to_numpy()]
+        keys = key_hashes(df, key)
+        kept = ~np.isin(self.keys, keys)
+        return SeenRows(np.concatenate([self.keys[kept], keys]), np.concatenate([self.rows[kept], row_hashes(df, key)]),
+                        self.base_hash)
+
+    def save(self, csv_path):
+        prepare_delta_dir(csv_path, self.base_hash)
+        path = seen_path(csv_path)
+        tmp_path = f'{path}.{os.getpid()}.tmp.npz'
+        np.savez(tmp_path, keys=self.keys, rows=self.rows)
+        os.replace(tmp_path, path)
+
+#Conjunto do export atual: lido do disco quando vale para ele; senão montado numa passada em blocos
+#pelo export base e pelos deltas já aplicados. base_hash evita reler o export para o hash.
+def load_seen_rows(csv_path, key=DEDUP_KEY, base_hash=None):
+    base_hash = base_hash or file_hash(csv_path)
+    path = seen_path(csv_path)
+    if delta_base(csv_path) == base_hash and os.path.exists(path):
+        with np.load(path) as data:
+            return SeenRows(data['keys'], data['rows'], base_hash)
+
+    keys = []
+    rows = []
+    for source in source_files(csv_path):
+        for chunk in pd.read_csv(source, chunksize=CHUNKSIZE):
+            keys.append(key_hashes(chunk, key))
+            rows.append(row_hashes(chunk, key))
+    empty = np.empty(0, dtype=np.uint64)
+    seen = SeenRows(np.concatenate(keys or [empty]), np.concatenate(rows or [empty]), base_hash)
+    for delta in delta_files(csv_path, base_hash):
+        seen = seen.upsert(pd.read_csv(delta), key)
+    return seen
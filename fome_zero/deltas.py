@@ -0,0 +1,100 @@
+import hashlib
+import os
+import shutil
+
+import pandas as pd
+
+from fome_zero.cleaning import DEDUP_KEY, code_cleaning, enrich, rename_columns
+from fome_zero.schema import apply_schema
+from fome_zero.sources import file_hash
+
+# =========================================================================
+# Deltas: arquivos com restaurantes novos ou alterados, aplicados sobre o export base
+# =========================================================================
+
+DELTA_DIR = 'files/cache/deltas'
+
+#Os deltas de um export ficam em files/cache/deltas/<nome do csv>/, numerados na ordem de chegada.
+#O arquivo BASE guarda o hash do export sobre o qual eles valem: um export novo descarta os deltas antigos.
+def delta_dir(csv_path, root=DELTA_DIR):
+    stem = os.path.splitext(os.path.basename(os.path.normpath(csv_path)))[0]
+    return os.path.join(root, stem)
+
+def _base_hash(directory):
+    try:
+        with open(os.path.join(directory, 'BASE')) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+#Hash do export sobre o qual os deltas guardados valem (None sem deltas)
+def delta_base(csv_path, root=DELTA_DIR):
+    return _base_hash(delta_dir(csv_path, root))
+
+#Fingerprint barato dos deltas (nomes dos arquivos), sem ler conteúdo nem calcular o hash do export
+def delta_fingerprint(csv_path, root=DELTA_DIR):
+    directory = delta_dir(csv_path, root)
+    if not os.path.isdir(directory):
+        return ()
+    return tuple(sorted(name for name in os.listdir(directory) if name.endswith('.csv')))
+
+#Arquivos de delta válidos para o export atual, em ordem de aplicação
+def delta_files(csv_path, base_hash=None, root=DELTA_DIR):
+    directory = delta_dir(csv_path, root)
+    if not os.path.isdir(directory):
+        return []
+    base_hash = base_hash or file_hash(csv_path)
+    if _base_hash(directory) != base_hash:
+        return []
+    return [os.path.join(directory, name) for name in sorted(os.listdir(directory)) if name.endswith('.csv')]
+
+#Diretório dos deltas pronto para o export com esse hash; o que era de um export anterior é descartado
+def prepare_delta_dir(csv_path, base_hash, root=DELTA_DIR):
+    directory = delta_dir(csv_path, root)
+    if _base_hash(directory) != base_hash:
+        shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, 'BASE'), 'w') as f:
+        f.write(base_hash)
+    return directory
+
+#Versão dos hashes de linha (cleaning.row_hashes) gravados em SEEN: um arquivo de outra versão é
+#ignorado e refeito a partir do export e dos deltas
+SEEN_VERSION = 2
+
+#Linhas já ingeridas do export (ver dedup.SeenRows), guardadas junto dos deltas
+def seen_path(csv_path, root=DELTA_DIR):
+    return os.path.join(delta_dir(csv_path, root), f'SEEN_v{SEEN_VERSION}.npz')
+
+#Grava as linhas (ainda no formato do CSV original) como o próximo delta do export; deltas de um
+#export anterior são descartados. base_hash evita reler o export quando quem chama já tem o hash dele.
+def store_delta(rows, csv_path, root=DELTA_DIR, base_hash=None):
+    base_hash = base_hash or file_hash(csv_path)
+    directory = prepare_delta_dir(csv_path, base_hash, root)
+
+    data = rows.to_csv(index=False).encode()
+    sequence = len(delta_files(csv_path, base_hash, root))
+    name = f'{sequence:06d}_{hashlib.sha256(data).hexdigest()[:16]}.csv'
+    with open(os.path.join(directory, name), 'wb') as f:
+        f.write(data)
+    return name
+
+#Mesmo pipeline de build_dataset, só para as linhas do delta. A triagem de outliers é feita depois do
+#upsert, no dataset inteiro. Se o mesmo restaurante aparece mais de uma vez, vale a última linha.
+def clean_delta(df, key=DEDUP_KEY):
+    df = code_cleaning(df, key)
+    df = rename_columns(enrich(df))
+    df = df.drop_duplicates('restaurant_id', keep='last').reset_index(drop=True)
+    return apply_schema(df)
+
+def read_deltas(files):
+    deltas = [clean_delta(pd.read_csv(path)) for path in files]
+    if not deltas:
+        return None
+    delta = pd.concat(deltas, ignore_index=True).drop_duplicates('restaurant_id', keep='last')
+    return apply_schema(delta.reset_index(drop=True))
+
+#Substitui as linhas dos restaurantes presentes no delta e acrescenta os novos
+def upsert(df, delta):
+    kept = df.loc[~df['restaurant_id'].isin(delta['restaurant_id'])]
+    return apply_schema(pd.concat([kept, delta], ignore_index=True))
@@ -0,0 +1,29 @@
+import sys
+
+from fome_zero.loader import CSV_PATH
+from fome_zero.schema import memory_per_row
+from fome_zero.snapshot import (build_snapshot, quarantine_path, remove_stale_snapshots, shared_path, snapshot_path,
+                                write_manifest, write_screen, write_shared, write_snapshot)
+from fome_zero.sources import file_hash
+
+# =========================================================================
+# Etapa de ETL: gera o snapshot Parquet e a cópia Arrow compartilhada antes de subir o dashboard
+#   python -m fome_zero.etl [caminho_do_csv_ou_diretório_de_shards]
+# =========================================================================
+
+def main(argv):
+    csv_path = argv[1] if len(argv) > 1 else CSV_PATH
+    base_hash = file_hash(csv_path)
+    path = snapshot_path(csv_path, base_hash=base_hash)
+    df, quarantine, screen, deltas = build_snapshot(csv_path, base_hash)
+    write_snapshot(quarantine, quarantine_path(path))
+    write_screen(screen, path)
+    write_snapshot(df, path)
+    write_shared(df, shared_path(path))
+    write_manifest({'deltas': deltas, 'fragments': []}, path)
+    remove_stale_snapshots(path)
+    print(f'{len(df)} linhas gravadas em {path} ({memory_per_row(df):.0f} bytes/linha em memória)')
+    print(f'{len(quarantine)} linhas com preço fora da faixa do país em {quarantine_path(path)}')
+
+if __name__ == '__main__':
+    main(sys.argv)
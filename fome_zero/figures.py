@@ -0,0 +1,163 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import plotly.graph_objects as go
+import plotly.io as pio
+import streamlit as st
+
+from fome_zero.loader import CSV_PATH, dataset_version, row_selection
+from fome_zero.singleflight import SingleFlight
+
+# =========================================================================
+# Cache LRU das figuras prontas, por página, gráfico e estado dos filtros
+# =========================================================================
+
+FIGURE_CACHE_SIZE = 256
+
+#Hash canônico de página + gráfico + versão do dataset + linhas selecionadas pelos filtros
+def figure_key(page, chart, version, selection):
+    payload = json.dumps([page, chart, version, selection], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+#Guarda o JSON serializado de cada figura: no acerto a figura é só desserializada, sem agregação
+#e sem passar pelo plotly.express. O JSON veio de uma figura válida, então a validação é pulada.
+#Os contadores ficam disponíveis em stats().
+def _from_json(figure_json):
+    return go.Figure(json.loads(figure_json), _validate=False)
+
+class FigureCache:
+
+    def __init__(self, maxsize=FIGURE_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._figures = OrderedDict()
+        self._lock = threading.Lock()
+        self._flight = SingleFlight()
+
+    def get(self, key):
+        with self._lock:
+            figure_json = self._figures.get(key)
+            if figure_json is None:
+                self.misses += 1
+                return None
+            self._figures.move_to_end(key)
+            self.hits += 1
+        return _from_json(figure_json)
+
+    def put(self, key, fig):
+        figure_json = fig.to_json()
+        with self._lock:
+            self._figures[key] = figure_json
+            self._figures.move_to_end(key)
+            while len(self._figures) > self.maxsize:
+                self._figures.popitem(last=False)
+                self.evictions += 1
+
+    #Sessões concorrentes com a mesma chave montam a figura uma vez só
+    def get_or_build(self, key, build):
+        fig = self.get(key)
+        if fig is None:
+            fig = self._flight.do(key, lambda: self._build(key, build))
+        return fig
+
+    def _build(self, key, build):
+        with self._lock:
+            figure_json = self._figures.get(key)
+        if figure_json is not None:
+            return _from_json(figure_json)
+        fig = build()
+        self.put(key, fig)
+        return fig
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'size': len(self._figures), 'bytes': sum(len(value) for value in self._figures.values())}
+
+    def clear(self):
+        with self._lock:
+            self._figures.clear()
+
+figure_cache = FigureCache()
+
+#Figura de chart(data()) para a página e os filtros atuais. data é chamado só quando a figura
+#não está no cache, então um acerto pula tanto a agregação quanto a montagem do gráfico.
+#Os gráficos dependem só das linhas selecionadas: um widget alterado que não muda a seleção
+#mantém as figuras de antes.
+def cached_figure(page, chart, data, csv_path=CSV_PATH, **filters):
+    key = figure_key(page, chart.__name__, dataset_version(csv_path), row_selection(csv_path, **filters))
+    return figure_cache.get_or_build(key, lambda: chart(data()))
+
+# =========================================================================
+# Montagem concorrente das figuras de uma página
+# =========================================================================
+
+#Threads e não processos: o groupby e as operações do numpy soltam o GIL, e as figuras e agregados
+#ficam nos caches deste processo para os próximos reruns
+CHART_WORKERS = int(os.environ.get('FOME_ZERO_CHART_WORKERS', min(4, os.cpu_count() or 1)))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def _pool():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=CHART_WORKERS, thread_name_prefix='fome_zero_charts')
+    return _executor
+
+#Custo medido de cada gráfico, em segundos: {(página, gráfico): média móvel exponencial}
+COST_SMOOTHING = 0.3
+chart_costs = {}
+_costs_lock = threading.Lock()
+
+#Mede só chart(data) nos misses do cache: data já vem resolvido (a agregação compartilhada entre os
+#gráficos não entra no custo de nenhum) e um acerto não chama o gráfico, então não é medido. O template
+#padrão do plotly é carregado antes, para a primeira medida não levar o custo de carregá-lo.
+def _timed_figure(page, chart, data, csv_path, filters):
+    key = (page, chart.__name__)
+
+    def timed_chart(rows):
+        pio.templates[pio.templates.default]
+        start = time.perf_counter()
+        fig = chart(rows)
+        elapsed = time.perf_counter() - start
+        with _costs_lock:
+            previous = chart_costs.get(key)
+            chart_costs[key] = elapsed if previous is None else previous + COST_SMOOTHING * (elapsed - previous)
+        return fig
+
+    timed_chart.__name__ = chart.__name__
+    return cached_figure(page, timed_chart, data, csv_path, **filters)
+
+#Espaço de um gráfico no layout, já com um aviso de carregamento que é trocado pela figura
+def chart_slot():
+    slot = st.empty()
+    slot.caption('⏳ Carregando gráfico...')
+    return slot
+
+#charts: lista de (slot, chart, data) com os mesmos chart/data de cached_figure. Gera (slot, figura)
+#na ordem em que as figuras ficam prontas; só a montagem roda no pool, os elementos do Streamlit
+#continuam sendo escritos pela thread do script. Os gráficos mais baratos, pelo custo medido nas
+#execuções anteriores, são montados primeiro; os ainda sem medida mantêm a ordem do layout.
+def build_figures(page, charts, csv_path=CSV_PATH, **filters):
+    with _costs_lock:
+        charts = sorted(charts, key=lambda item: chart_costs.get((page, item[1].__name__), 0.0))
+
+    if CHART_WORKERS == 1:
+        #com um só núcleo o pool só adicionaria troca de contexto
+        for slot, chart, data in charts:
+            yield slot, _timed_figure(page, chart, data, csv_path, filters)
+        return
+
+    futures = {_pool().submit(_timed_figure, page, chart, data, csv_path, filters): slot
+               for slot, chart, data in charts}
+    for future in as_completed(futures):
+        yield futures[future], future.result()
@@ -0,0 +1,192 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# =========================================================================
+# Filtros da sidebar aplicados às linhas do dataset
+# =========================================================================
+
+#Colunas dos filtros de faixa (sliders) e do filtro de países (multiselect)
+RANGE_COLUMNS = ['average_cost_for_two_brl', 'aggregate_rating']
+COUNTRY_COLUMN = 'country_name'
+
+#Índices dos filtros, montados uma vez por versão do dataset: permutação ordenada de cada coluna de
+#faixa (a faixa vira duas buscas binárias), as posições das linhas de cada país (bitmap esparso) e o
+#código do país de cada linha, para conferir a seleção de países em posições já escolhidas.
+#O filtro parte do menor conjunto candidato (o tamanho de cada um sai das buscas binárias e das
+#postings, sem materializar nenhum) e confere os outros critérios só nessas linhas, então o custo
+#acompanha o tamanho do filtro mais seletivo, não o da tabela. Filtros que deixam passar todas as linhas
+#(todos os países, uma faixa que cobre tudo) não são conferidos. O resultado de cada estado completo dos
+#filtros fica num cache LRU, então voltar a um estado já visto não refaz nada.
+#Quando só um widget muda, o estado sem ele (os outros filtros já aplicados, ordenado) também vai para o
+#cache e o resultado parte dele: mexer de novo no mesmo widget só confere esse filtro nessas linhas.
+STAGE_CACHE_SIZE = 32
+
+#Um resultado em cache com parte dos filtros aplicados já está ordenado, então conferir as linhas dele
+#dispensa a ordenação do fim; ele é usado como ponto de partida até esse múltiplo do filtro mais seletivo
+REFINE_RATIO = 2
+
+class FilterIndex:
+
+    def __init__(self, df):
+        self.rows = len(df)
+        codes, names = pd.factorize(df[COUNTRY_COLUMN])
+        order = np.argsort(codes, kind='stable')
+        bounds = np.searchsorted(codes[order], np.arange(len(names) + 1))
+        self.country_codes = codes
+        self.country_code = {country: code for code, country in enumerate(names)}
+        self.countries = {country: order[bounds[code]:bounds[code + 1]] for country, code in self.country_code.items()}
+        self.values = {col: df[col].to_numpy() for col in RANGE_COLUMNS}
+        self.order = {}
+        self.sorted = {}
+        for col in RANGE_COLUMNS:
+            order = np.argsort(self.values[col], kind='stable')
+            self.order[col] = order
+            self.sorted[col] = self.values[col][order]
+        self._stages = OrderedDict()
+        self._last = None
+        self._lock = threading.Lock()
+
+    def _range_positions(self, col, bounds):
+        lo = np.searchsorted(self.sorted[col], bounds[0], side='left')
+        hi = np.searchsorted(self.sorted[col], bounds[1], side='right')
+        return self.order[col][lo:hi]
+
+    def _country_positions(self, countries):
+        parts = [self.countries[country] for country in countries if country in self.countries]
+        if not parts:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate(parts)
+
+    #Número de linhas que passam no filtro da posição i do estado (países, preço, nota)
+    def _size(self, i, value):
+        if i == 0:
+            return sum(len(self.countries.get(country, ())) for country in value)
+        col = RANGE_COLUMNS[i - 1]
+        return (np.searchsorted(self.sorted[col], value[1], side='right')
+                - np.searchsorted(self.sorted[col], value[0], side='left'))
+
+    #Posições (sem ordem) das linhas que passam no filtro da posição i do estado
+    def _stage(self, i, value):
+        if i == 0:
+            return self._country_positions(value)
+        return self._range_positions(RANGE_COLUMNS[i - 1], value)
+
+    #Mantém, das posições já selecionadas, só as que passam no filtro da posição i do estado
+    def _refine(self, positions, i, value):
+        if i == 0:
+            wanted = np.zeros(len(self.country_code), dtype=bool)
+            wanted[[self.country_code[country] for country in value if country in self.country_code]] = True
+            return positions[wanted[self.country_codes[positions]]]
+        values = self.values[RANGE_COLUMNS[i - 1]][positions]
+        return positions[(values >= value[0]) & (values <= value[1])]
+
+    #Menor resultado em cache, com até limit linhas, de um estado com parte dos filtros de state (os
+    #demais None): (estado, posições) ou None
+    def _cached_start(self, state, limit):
+        best = None
+        with self._lock:
+            for cached, positions in self._stages.items():
+                if len(positions) > limit or (best is not None and len(positions) >= len(best[1])):
+                    continue
+                if all(value is None or value == wanted for value, wanted in zip(cached, state)):
+                    best = (cached, positions)
+        return best
+
+    #Posições (ordenadas) das linhas que passam nos filtros; None quando nenhum filtro é aplicado.
+    #O array devolvido fica no cache e não deve ser alterado.
+    def positions(self, countries=None, cost_range=None, rating_range=None):
+        state = filter_state(countries, cost_range, rating_range)
+        if state == (None, None, None):
+            return None
+
+        with self._lock:
+            positions = self._stages.get(state)
+            if positions is not None:
+                self._stages.move_to_end(state)
+                return positions
+            last = self._last
+
+        sizes = {i: self._size(i, value) for i, value in enumerate(state) if value is not None}
+        active = sorted((i for i in sizes if sizes[i] < self.rows), key=sizes.get)
+        start = self._cached_start(state, REFINE_RATIO * sizes[active[0]]) if active else None
+        moved = [i for i in active if last is not None and last[i] != state[i]]
+        if start is None and len(moved) == 1 and len(active) > 1:
+            prefix = tuple(None if i == moved[0] else value for i, value in enumerate(state))
+            start = (prefix, self.positions(*prefix))
+
+        if not active:
+            positions = np.arange(self.rows)
+        elif start is not None:
+            cached, positions = start
+            for i in active:
+                if cached[i] is None:
+                    positions = self._refine(positions, i, state[i])
+        else:
+            positions = self._stage(active[0], state[active[0]])
+            for i in active[1:]:
+                positions = self._refine(positions, i, state[i])
+            positions = np.sort(positions)
+
+        with self._lock:
+            self._last = state
+            self._stages[state] = positions
+            while len(self._stages) > STAGE_CACHE_SIZE:
+                self._stages.popitem(last=False)
+        return positions
+
+#Estado canônico dos filtros, usado nas chaves de cache: a ordem dos países no multiselect
+#não muda o resultado e os limites viram float
+def filter_state(countries=None, cost_range=None, rating_range=None):
+    if countries is not None:
+        countries = tuple(sorted(countries))
+    if cost_range is not None:
+        cost_range = tuple(float(value) for value in cost_range)
+    if rating_range is not None:
+        rating_range = tuple(float(value) for value in rating_range)
+    return countries, cost_range, rating_range
+
+#Seleção de países como máscara: em colunas categóricas só as categorias são comparadas e a máscara
+#sai dos códigos de cada linha (o código -1, de nulo, cai no False acrescentado no fim)
+def _country_mask(series, countries):
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        wanted = np.append(series.cat.categories.isin(countries), False)
+        return wanted[series.cat.codes.to_numpy()]
+    return series.isin(countries).to_numpy()
+
+#Todos os filtros ativos numa única máscara booleana, avaliada direto nos arrays das colunas e
+#combinada in-place, sem DataFrame intermediário; None quando nenhum filtro é aplicado
+def filter_mask(df, countries=None, cost_range=None, rating_range=None):
+    mask = _country_mask(df[COUNTRY_COLUMN], countries) if countries is not None else None
+    buffer = None
+    for col, bounds in zip(RANGE_COLUMNS, (cost_range, rating_range)):
+        if bounds is None:
+            continue
+        values = df[col].to_numpy()
+        if mask is None:
+            mask = np.greater_equal(values, bounds[0])
+        else:
+            buffer = np.greater_equal(values, bounds[0], out=buffer)
+            mask &= buffer
+        buffer = np.less_equal(values, bounds[1], out=buffer)
+        mask &= buffer
+    return mask
+
+#countries: lista de países; cost_range e rating_range: tuplas (mínimo, máximo), inclusivas.
+#Filtros None não são aplicados. Com um FilterIndex do mesmo DataFrame o filtro usa o índice
+#em vez de varrer as colunas. columns limita o resultado às colunas que o consumidor lê: as linhas
+#selecionadas são copiadas uma única vez, só nessas colunas. Sem filtro nenhum o df volta como está.
+def apply_filters(df, countries=None, cost_range=None, rating_range=None, index=None, columns=None):
+    if index is not None:
+        positions = index.positions(countries, cost_range, rating_range)
+    else:
+        mask = filter_mask(df, countries, cost_range, rating_range)
+        positions = None if mask is None else np.flatnonzero(mask)
+    if positions is None:
+        return df
+    if columns is None:
+        return df.take(positions)
+    #take coluna a coluna nos arrays: mais barato que o iloc nos dois eixos sobre os blocos do frame mapeado
+    return pd.DataFrame({col: df[col].array.take(positions) for col in columns}, index=df.index.take(positions))
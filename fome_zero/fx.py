@@ -0,0 +1,87 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from fome_zero.sources import file_fingerprint
+
+# =========================================================================
+# Conversão de moedas por tabela de cotações datada
+# =========================================================================
+
+#Cotações em CSV (date, currency, brl): quanto vale uma unidade da moeda em reais a partir daquela data.
+#Uma versão nova só precisa listar as moedas que mudaram; as demais seguem com a cotação anterior.
+RATES_PATH = 'files/dataset/fx_rates.csv'
+
+BASE_CURRENCY = 'Brazilian Real(R$)'
+
+#Coluna derivada lida pelas páginas; não fica no snapshot, é calculada na carga para a versão das cotações
+COST_COLUMN = 'average_cost_for_two_brl'
+LOCAL_COST_COLUMN = 'average_cost_for_two'
+
+class RateTable:
+
+    def __init__(self, rates):
+        self.rates = rates.sort_values('date', kind='stable').reset_index(drop=True)
+        self._factors = {}
+
+    @classmethod
+    def from_csv(cls, path=RATES_PATH):
+        return cls(pd.read_csv(path, dtype={'date': str, 'currency': str, 'brl': float}))
+
+    #Datas de vigência disponíveis, da mais antiga para a mais recente
+    def versions(self):
+        return self.rates['date'].drop_duplicates().tolist()
+
+    #Versão vigente em as_of (data ISO); None é a mais recente
+    def version(self, as_of=None):
+        versions = self.versions()
+        if as_of is None:
+            return versions[-1]
+        position = np.searchsorted(versions, str(as_of), side='right')
+        if position == 0:
+            raise ValueError(f'sem cotações em {as_of}; a primeira é de {versions[0]}')
+        return versions[position - 1]
+
+    #Fator de cada moeda para a moeda de exibição, na versão vigente em as_of: moeda -> fator
+    def factors(self, as_of=None, currency=BASE_CURRENCY):
+        key = (self.version(as_of), currency)
+        if key not in self._factors:
+            rates = self.rates.loc[self.rates['date'] <= key[0]].drop_duplicates('currency', keep='last')
+            brl = rates.set_index('currency')['brl']
+            if currency not in brl.index:
+                raise KeyError(f'moeda de exibição sem cotação: {currency}')
+            self._factors[key] = brl / brl[currency]
+        return self._factors[key]
+
+#Custo convertido: junta cada linha ao fator da sua moeda pelos códigos do categórico, sem laço por linha.
+#Moedas fora da tabela viram NaN; o pipeline de limpeza já rejeita essas linhas (UnknownCodeError).
+def convert(df, factors):
+    currencies = df['currency'].astype('category')
+    table = factors.reindex(currencies.cat.categories).to_numpy()
+    return df[LOCAL_COST_COLUMN].to_numpy() * table[currencies.cat.codes.to_numpy()]
+
+#Mesmas colunas de df mais a coluna convertida. A cópia é rasa: as demais colunas não são copiadas e
+#df (que pode ser o mapeado somente leitura) não é alterado.
+def with_costs(df, costs):
+    df = df.copy(deep=False)
+    df[COST_COLUMN] = costs
+    return df
+
+_tables = {}
+_lock = threading.Lock()
+
+def rates_fingerprint(path=RATES_PATH):
+    return file_fingerprint(path)
+
+#Tabela de cotações do arquivo, relida só quando ele muda
+def load_rates(path=RATES_PATH):
+    fingerprint = rates_fingerprint(path)
+    cached = _tables.get(path)
+    if cached is not None and cached[0] == fingerprint:
+        return cached[1]
+    table = RateTable.from_csv(path)
+    with _lock:
+        _tables[path] = (fingerprint, table)
+    return table
+
@@ -0,0 +1,147 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# =========================================================================
+# Agrupamento das coordenadas dos restaurantes em células do mapa, no servidor
+# =========================================================================
+
+#Células de 64 px na tela: com tiles de 256 px, a célula do zoom z é o tile do nível z + 2 do Web Mercator,
+#e a célula de um zoom menor sai da do zoom maior com um deslocamento de bits (quadtree)
+CELL_LEVELS = 2
+
+#Zoom mais fino guardado (células de ~150 m no equador); acima dele as células não se dividem mais
+MAX_ZOOM = 16
+
+#Latitude máxima do Web Mercator
+MAX_LATITUDE = 85.0511287798
+
+#Roll-ups por zoom e seleção de países guardados
+ROLLUP_CACHE_SIZE = 32
+
+#Orçamento de marcadores por mapa: acima dele as células do zoom anterior (4x maiores) são usadas
+MAX_MARKERS = 1000
+
+#Somas guardadas por célula; os marcadores mostram a contagem, o centro de massa e a nota média
+SUM_COLUMNS = ['count', 'lat_sum', 'lon_sum', 'rating_sum']
+
+#Posição (x, y) em [0, 1) no Web Mercator
+def mercator(lat, lon):
+    lat = np.radians(np.clip(lat, -MAX_LATITUDE, MAX_LATITUDE))
+    x = (lon + 180.0) / 360.0
+    y = (1.0 - np.log(np.tan(lat) + 1.0 / np.cos(lat)) / np.pi) / 2.0
+    return np.clip(x, 0.0, np.nextafter(1.0, 0.0)), np.clip(y, 0.0, np.nextafter(1.0, 0.0))
+
+def _cell_bits(zoom):
+    return min(zoom, MAX_ZOOM) + CELL_LEVELS
+
+#Somas por célula (e por país, com by_country). As chaves viram um inteiro só (código do país, x, y),
+#então o agrupamento é um np.unique mais um np.bincount por coluna. O nome do restaurante vai junto
+#(o da primeira linha) e é mostrado nas células com um restaurante só; names é lido só nessas posições.
+def _bin(cells, names, by_country=True):
+    codes, countries = pd.factorize(cells['country_name']) if by_country else (np.zeros(len(cells), int), None)
+    key = (codes.astype(np.int64) << 40) | (cells['cx'].to_numpy() << 20) | cells['cy'].to_numpy()
+    key, first, inverse = np.unique(key, return_index=True, return_inverse=True)
+    binned = {
+        'cx': (key >> 20) & 0xFFFFF,
+        'cy': key & 0xFFFFF,
+    }
+    if by_country:
+        binned['country_name'] = np.asarray(countries, dtype=object)[key >> 40]
+    for col in SUM_COLUMNS:
+        binned[col] = np.bincount(inverse, weights=cells[col].to_numpy(), minlength=len(key))
+    binned['count'] = binned['count'].astype(np.int64)
+    binned['restaurant_name'] = np.asarray(names.take(first), dtype=object)
+    return pd.DataFrame(binned)
+
+#Células do zoom mais fino por país. Como PartialAggregates, dois blocos se combinam com merge(); os
+#zooms menores são roll-ups das células finas (e não das linhas), calculados na primeira consulta de
+#cada zoom. O navegador recebe um marcador por célula visível, não um por restaurante: o número de
+#marcadores é limitado pelo tamanho da tela em células, seja qual for o número de linhas.
+class GeoBins:
+
+    def __init__(self, cells):
+        self.cells = cells
+        self._rollups = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_frame(cls, df):
+        lat = df['latitude'].to_numpy(dtype=float)
+        lon = df['longitude'].to_numpy(dtype=float)
+        x, y = mercator(lat, lon)
+        scale = 2 ** _cell_bits(MAX_ZOOM)
+        frame = pd.DataFrame({
+            'country_name': df['country_name'].array,
+            'cx': (x * scale).astype(np.int64),
+            'cy': (y * scale).astype(np.int64),
+            'count': 1,
+            'lat_sum': lat,
+            'lon_sum': lon,
+            'rating_sum': df['aggregate_rating'].to_numpy(dtype=float),
+        })
+        return cls(_bin(frame, df['restaurant_name'].array))
+
+    @classmethod
+    def combine(cls, partials):
+        cells = pd.concat([p.cells for p in partials], ignore_index=True)
+        return cls(_bin(cells, cells['restaurant_name'].to_numpy()))
+
+    def merge(self, other):
+        return GeoBins.combine([self, other])
+
+    #Células de um zoom para uma lista de países (None = todos), sem separar por país
+    def _rollup(self, zoom, countries):
+        key = (zoom, countries)
+        with self._lock:
+            if key in self._rollups:
+                self._rollups.move_to_end(key)
+                return self._rollups[key]
+
+        cells = self.cells
+        if countries is not None:
+            cells = cells.loc[cells['country_name'].isin(countries)]
+        shift = MAX_ZOOM - zoom
+        cells = cells.assign(cx=cells['cx'].to_numpy() >> shift, cy=cells['cy'].to_numpy() >> shift)
+        cells = _bin(cells, cells['restaurant_name'].to_numpy(), by_country=False)
+
+        with self._lock:
+            self._rollups[key] = cells
+            while len(self._rollups) > ROLLUP_CACHE_SIZE:
+                self._rollups.popitem(last=False)
+        return cells
+
+    def _visible(self, zoom, bounds, countries):
+        cells = self._rollup(zoom, countries)
+        if bounds is None:
+            return cells
+        (south, west), (north, east) = bounds
+        scale = 2 ** _cell_bits(zoom)
+        x0, y1 = mercator(south, max(west, -180.0))
+        x1, y0 = mercator(north, min(east, 180.0))
+        cx = cells['cx'].to_numpy()
+        cy = cells['cy'].to_numpy()
+        inside = ((cx >= int(x0 * scale)) & (cx <= int(x1 * scale))
+                  & (cy >= int(y0 * scale)) & (cy <= int(y1 * scale)))
+        return cells.loc[inside]
+
+    #Marcadores do zoom dentro de bounds ((sul, oeste), (norte, leste)); bounds None é o mundo todo.
+    #Cada marcador traz a posição média dos restaurantes da célula, a contagem e a nota média.
+    def markers(self, zoom, bounds=None, countries=None):
+        countries = tuple(sorted(countries)) if countries is not None else None
+        zoom = min(int(zoom), MAX_ZOOM)
+        cells = self._visible(zoom, bounds, countries)
+        while len(cells) > MAX_MARKERS and zoom > 0:
+            zoom -= 1
+            cells = self._visible(zoom, bounds, countries)
+
+        count = cells['count'].to_numpy()
+        return pd.DataFrame({
+            'latitude': cells['lat_sum'].to_numpy() / count,
+            'longitude': cells['lon_sum'].to_numpy() / count,
+            'count': count,
+            'aggregate_rating': cells['rating_sum'].to_numpy() / count,
+            'restaurant_name': np.where(count == 1, cells['restaurant_name'].to_numpy(), None),
+        })
@@ -0,0 +1,404 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from fome_zero.aggregates import AGGREGATE_COLUMNS, ALL_GRAINS, CUBE, PartialAggregates, stored_grains
+from fome_zero.catalog import ColumnCatalog
+from fome_zero.dedup import load_seen_rows
+from fome_zero.deltas import clean_delta, delta_files, delta_fingerprint, store_delta
+from fome_zero.filters import FilterIndex, apply_filters, filter_state
+from fome_zero.fx import BASE_CURRENCY, COST_COLUMN, convert, load_rates, rates_fingerprint, with_costs
+from fome_zero.geo import GeoBins
+from fome_zero.outliers import OutlierScreen, group_mask
+from fome_zero.schema import apply_schema
+from fome_zero.singleflight import SingleFlight
+from fome_zero.snapshot import (append_fragment, load_snapshot, publish_snapshot, read_quarantine, read_screen,
+                                snapshot_path)
+from fome_zero.sources import file_fingerprint, file_hash
+from fome_zero.streaming import aggregate_csv, fit_screen, iter_clean_chunks, merge_partials, use_streaming
+
+# =========================================================================
+# Carregamento do dataset compartilhado entre as páginas
+# =========================================================================
+
+CSV_PATH = 'files/dataset/zomato.csv'
+
+#cache por processo: {caminho absoluto: (fingerprint, DataFrame tratado)}
+_cache = {}
+_lock = threading.Lock()
+
+#dataset como está no snapshot, sem o custo convertido: {caminho absoluto: (fingerprint da fonte, DataFrame)}
+_bases = {}
+
+#custo convertido por versão das cotações e moeda de exibição: {(caminho, fingerprints, versão, moeda): array}
+COSTS_CACHE_SIZE = 16
+_costs = OrderedDict()
+
+#índices dos filtros por dataset: {caminho absoluto: (fingerprint, FilterIndex)}
+_indexes = {}
+
+#catálogo de estatísticas das colunas por dataset: {caminho absoluto: (fingerprint, ColumnCatalog)}
+_catalogs = {}
+
+#células do mapa por dataset: {caminho absoluto: (fingerprint da fonte, GeoBins)}
+_geo_bins = {}
+
+#linhas em quarentena (outliers de preço) por dataset: {caminho absoluto: (fingerprint, DataFrame)}
+_quarantines = {}
+
+#histograma de triagem de outliers do modo em blocos: {caminho absoluto: (fingerprint, OutlierScreen)}
+_screens = {}
+
+#cache LRU dos agregados por estado dos filtros
+AGGREGATES_CACHE_SIZE = 64
+_aggregates_cache = OrderedDict()
+
+#os mesmos agregados pelo conjunto de linhas selecionado: {(caminho, fingerprint, grãos, seleção): agregados}
+_selections = OrderedDict()
+
+#sessões pedindo o mesmo estado dos filtros ao mesmo tempo esperam um único cálculo
+aggregates_flight = SingleFlight()
+
+#Versão da fonte: export e deltas aplicados
+def _source_fingerprint(path):
+    return (file_fingerprint(path), delta_fingerprint(path))
+
+def _fingerprint(path):
+    return _source_fingerprint(path) + (rates_fingerprint(),)
+
+#Versão do dataset (export, deltas aplicados e cotações), para chaves de cache fora do loader
+def dataset_version(csv_path=CSV_PATH):
+    return _fingerprint(os.path.abspath(csv_path))
+
+#carga do snapshot (ou reconstrução do CSV) em andamento, por (caminho, fingerprint da fonte)
+base_flight = SingleFlight()
+
+#Dataset sem a coluna convertida, refazendo leitura e limpeza só quando o CSV (ou o diretório de shards)
+#ou os deltas mudam. Na primeira carga do processo o snapshot é usado no lugar do CSV, se estiver atualizado.
+#Sessões pedindo a mesma versão esperam uma única carga; _lock só protege a leitura e a escrita do
+#dicionário, então os outros caches do loader seguem respondendo durante uma reconstrução.
+def _load_base(key):
+    fingerprint = _source_fingerprint(key)
+
+    cached = _bases.get(key)
+    if cached is not None and cached[0] == fingerprint:
+        return cached[1]
+
+    def build():
+        with _lock:
+            cached = _bases.get(key)
+        if cached is not None and cached[0] == fingerprint:
+            return cached[1]
+
+        df = load_snapshot(key)
+        with _lock:
+            _bases[key] = (fingerprint, df)
+        return df
+
+    return base_flight.do((key, fingerprint), build)
+
+#Custo médio para dois convertido para a moeda de exibição com as cotações vigentes em as_of (data ISO;
+#None é a versão mais recente). Trocar a moeda ou a data refaz só esta coluna, sobre o dataset em cache.
+def load_costs(csv_path=CSV_PATH, as_of=None, currency=BASE_CURRENCY):
+    key = os.path.abspath(csv_path)
+    rates = load_rates()
+    cost_key = (key, _fingerprint(key), rates.version(as_of), currency)
+
+    with _lock:
+        if cost_key in _costs:
+            _costs.move_to_end(cost_key)
+            return _costs[cost_key]
+
+    costs = convert(_load_base(key), rates.factors(as_of, currency))
+    with _lock:
+        _costs[cost_key] = costs
+        while len(_costs) > COSTS_CACHE_SIZE:
+            _costs.popitem(last=False)
+    return costs
+
+#Retorna o DataFrame tratado, com average_cost_for_two_brl convertido pelas cotações mais recentes.
+#Com as_of ou currency a coluna (que mantém o nome lido pelas páginas) vem em outra versão das
+#cotações ou em outra moeda. O DataFrame retornado é mapeado do arquivo Arrow e compartilhado entre
+#sessões e processos: os buffers são somente leitura, então ele não pode ser alterado in-place.
+def load_dataset(csv_path=CSV_PATH, as_of=None, currency=BASE_CURRENCY):
+    key = os.path.abspath(csv_path)
+    if as_of is not None or currency != BASE_CURRENCY:
+        return with_costs(_load_base(key), load_costs(key, as_of, currency))
+
+    fingerprint = _fingerprint(key)
+    cached = _cache.get(key)
+    if cached is not None and cached[0] == fingerprint:
+        return cached[1]
+
+    df = with_costs(_load_base(key), load_costs(key))
+    with _lock:
+        _cache[key] = (fingerprint, df)
+    return df
+
+#Índices dos filtros da sidebar para o dataset atual, montados uma vez por versão dele
+def load_index(csv_path=CSV_PATH):
+    key = os.path.abspath(csv_path)
+    fingerprint = _fingerprint(key)
+
+    cached = _indexes.get(key)
+    if cached is not None and cached[0] == fingerprint:
+        return cached[1]
+
+    index = FilterIndex(load_dataset(key))
+    with _lock:
+        _indexes[key] = (fingerprint, index)
+    return index
+
+#Triagem de outliers dos exports grandes, montada numa passada em blocos uma vez por versão do dataset
+def load_screen(csv_path=CSV_PATH):
+    key = os.path.abspath(csv_path)
+    fingerprint = _source_fingerprint(key)
+
+    cached = _screens.get(key)
+    if cached is not None and cached[0] == fingerprint:
+        return cached[1]
+
+    screen = fit_screen(key)
+    with _lock:
+        _screens[key] = (fingerprint, screen)
+    return screen
+
+#Restaurantes com preço fora da faixa do seu país e moeda, tirados do dataset das páginas.
+#Fica ao lado do snapshot; em exports grandes é separada numa passada em blocos.
+def load_quarantine(csv_path=CSV_PATH):
+    key = os.path.abspath(csv_path)
+    fingerprint = _fingerprint(key)
+
+    cached = _quarantines.get(key)
+    if cached is not None and cached[0] == fingerprint:
+        return cached[1]
+
+    if use_streaming(key):
+        screen = load_screen(key)
+        chunks = [chunk.loc[screen.flags(chunk)] for chunk in iter_clean_chunks(key)]
+        quarantine = apply_schema(pd.concat(chunks, ignore_index=True))
+    else:
+        df = load_dataset(key)
+        quarantine = read_quarantine(snapshot_path(key))
+        if quarantine is None:
+            #snapshot sem quarentena gravada (deploy read-only): nada a mostrar
+            quarantine = df.iloc[:0]
+        else:
+            quarantine = with_costs(quarantine, convert(quarantine, load_rates().factors()))
+    with _lock:
+        _quarantines[key] = (fingerprint, quarantine)
+    return quarantine
+
+#Catálogo das colunas numéricas do dataset atual, calculado uma vez por versão dele (em exports
+#grandes, numa passada em blocos). Depois de um delta ele é refeito na próxima consulta.
+def load_catalog(csv_path=CSV_PATH):
+    key = os.path.abspath(csv_path)
+    fingerprint = _fingerprint(key)
+
+    cached = _catalogs.get(key)
+    if cached is not None and cached[0] == fingerprint:
+        return cached[1]
+
+    if use_streaming(key):
+        catalog = None
+        for chunk in iter_clean_chunks(key, screen=load_screen(key)):
+            partial = ColumnCatalog.from_frame(chunk)
+            catalog = partial if catalog is None else catalog.merge(partial)
+    else:
+        catalog = ColumnCatalog.from_frame(load_dataset(key))
+    with _lock:
+        _catalogs[key] = (fingerprint, catalog)
+    return catalog
+
+#Células do mapa (coordenadas agrupadas no servidor) do dataset atual, montadas uma vez por versão dele.
+#Em exports grandes saem de uma passada em blocos, como o catálogo.
+def load_geo_bins(csv_path=CSV_PATH):
+    key = os.path.abspath(csv_path)
+    fingerprint = _source_fingerprint(key)
+
+    cached = _geo_bins.get(key)
+    if cached is not None and cached[0] == fingerprint:
+        return cached[1]
+
+    if use_streaming(key):
+        bins = merge_partials(GeoBins.from_frame(chunk) for chunk in iter_clean_chunks(key, screen=load_screen(key)))
+    else:
+        bins = GeoBins.from_frame(load_dataset(key))
+    with _lock:
+        _geo_bins[key] = (fingerprint, bins)
+    return bins
+
+#Chave do conjunto de linhas que passa nos filtros. Estados diferentes que selecionam as mesmas linhas
+#(um slider movido sem cruzar nenhum valor do dataset, uma faixa que cobre tudo) têm a mesma chave, então
+#os agregados e as figuras que dependem só das linhas não são refeitos. No modo em blocos o DataFrame
+#não fica na memória e a chave é o próprio estado dos filtros.
+def row_selection(csv_path=CSV_PATH, countries=None, cost_range=None, rating_range=None):
+    path = os.path.abspath(csv_path)
+    state = filter_state(countries, cost_range, rating_range)
+    if use_streaming(path):
+        return state
+    index = load_index(path)
+    positions = index.positions(*state)
+    if positions is None or len(positions) == index.rows:
+        return 'all'
+    return hashlib.blake2b(positions.tobytes(), digest_size=16).hexdigest()
+
+#Agregados das páginas para um estado dos filtros da sidebar. Em exports maiores que
+#STREAMING_THRESHOLD_BYTES o CSV é agregado em blocos e o DataFrame completo nunca é carregado.
+#Consultas só de cubo filtradas por país são recortes do cubo completo, que fica no cache
+#(e quente nele) desde a primeira carga.
+def load_aggregates(csv_path=CSV_PATH, grains=ALL_GRAINS, countries=None, cost_range=None, rating_range=None):
+    path = os.path.abspath(csv_path)
+    grains = stored_grains(grains)
+    countries, cost_range, rating_range = filter_state(countries, cost_range, rating_range)
+    key = (path, _fingerprint(path), grains, countries, cost_range, rating_range)
+
+    with _lock:
+        if key in _aggregates_cache:
+            _aggregates_cache.move_to_end(key)
+            return _aggregates_cache[key]
+
+    return aggregates_flight.do(key, lambda: _compute_aggregates(key))
+
+def _compute_aggregates(key):
+    path, fingerprint, grains, countries, cost_range, rating_range = key
+    with _lock:
+        #outra chamada pode ter terminado entre a consulta ao cache e a entrada no single-flight
+        if key in _aggregates_cache:
+            return _aggregates_cache[key]
+
+    if grains == (CUBE,) and countries is not None and cost_range is None and rating_range is None:
+        aggregates = load_aggregates(path, grains).select(countries)
+    elif use_streaming(path):
+        aggregates = aggregate_csv(path, grains, countries, cost_range, rating_range, screen=load_screen(path))
+    else:
+        selection = (path, fingerprint, grains, row_selection(path, countries, cost_range, rating_range))
+        with _lock:
+            aggregates = _selections.get(selection)
+        if aggregates is None:
+            df = apply_filters(load_dataset(path), countries, cost_range, rating_range, load_index(path),
+                               columns=AGGREGATE_COLUMNS)
+            aggregates = PartialAggregates.from_frame(df, grains).finalize()
+        with _lock:
+            _selections[selection] = aggregates
+            _selections.move_to_end(selection)
+            while len(_selections) > AGGREGATES_CACHE_SIZE:
+                _selections.popitem(last=False)
+
+    with _lock:
+        _aggregates_cache[key] = aggregates
+        while len(_aggregates_cache) > AGGREGATES_CACHE_SIZE:
+            _aggregates_cache.popitem(last=False)
+
+    return aggregates
+
+#Aplica um arquivo de restaurantes novos ou alterados (mesmas colunas do zomato.csv) sem reprocessar
+#o export: só as linhas do delta passam pela limpeza e o snapshot ganha um fragmento com as linhas que
+#entram e os restaurant_id que saem, sem ser regravado. Os agregados em cache são atualizados com as
+#linhas removidas e adicionadas. Linhas iguais às que já estão no dataset (um delta reenviado, por
+#exemplo) são puladas e contadas em dedup_report. O export é lido uma vez só, para o hash.
+#O histograma da triagem de outliers é atualizado com as linhas trocadas; só os grupos (país, moeda)
+#cujo limite mudou são triados de novo, e os restaurantes que mudam de lado entram no fragmento.
+#Retorna o número de restaurantes aplicados.
+def apply_delta(delta_path, csv_path=CSV_PATH):
+    path = os.path.abspath(csv_path)
+    base_hash = file_hash(path)
+
+    raw = pd.read_csv(delta_path)
+    seen = load_seen_rows(path, base_hash=base_hash)
+    rows = seen.new_rows(raw)
+    if len(rows) == 0:
+        seen.save(path)
+        return 0
+
+    #limpa antes de gravar: um código desconhecido no delta não deixa nada pela metade
+    delta = clean_delta(rows)
+
+    if use_streaming(path):
+        store_delta(rows, path, base_hash=base_hash)
+        seen.upsert(rows).save(path)
+        with _lock:
+            for key in [key for key in _aggregates_cache if key[0] == path]:
+                del _aggregates_cache[key]
+            for key in [key for key in _selections if key[0] == path]:
+                del _selections[key]
+        return len(delta)
+
+    old_fingerprint = _fingerprint(path)
+    factors = load_rates().factors()
+    snapshot = snapshot_path(path, base_hash=base_hash)
+    base = _load_base(path)
+    quarantine = read_quarantine(snapshot)
+    if quarantine is None:
+        quarantine = load_quarantine(path).drop(columns=COST_COLUMN)
+    screen = read_screen(snapshot)
+    if screen is None:
+        screen = OutlierScreen.from_frame(pd.concat([base, quarantine], ignore_index=True))
+
+    replaced = base['restaurant_id'].isin(delta['restaurant_id']).to_numpy()
+    quarantined = quarantine['restaurant_id'].isin(delta['restaurant_id']).to_numpy()
+    new_screen = screen.update(pd.concat([base.loc[replaced], quarantine.loc[quarantined]]), delta)
+
+    #restaurantes fora do delta que entram ou saem da quarentena com os novos limites
+    changed = screen.changed_groups(new_screen)
+    moved_out = ~replaced & group_mask(base, changed)
+    moved_out[moved_out] = new_screen.flags(base.loc[moved_out])
+    moved_in = ~quarantined & group_mask(quarantine, changed)
+    moved_in[moved_in] = ~new_screen.flags(quarantine.loc[moved_in])
+
+    flags = new_screen.flags(delta)
+    tombstones = replaced | moved_out
+    rows_in = apply_schema(pd.concat([delta.loc[~flags], quarantine.loc[moved_in]], ignore_index=True))
+    quarantine = apply_schema(pd.concat([quarantine.loc[~quarantined & ~moved_in], base.loc[moved_out],
+                                         delta.loc[flags]], ignore_index=True))
+    removed = base.loc[tombstones]
+    base = apply_schema(pd.concat([base.loc[~tombstones], rows_in], ignore_index=True))
+
+    name = store_delta(rows, path, base_hash=base_hash)
+    seen.upsert(rows).save(path)
+    if not append_fragment(snapshot, name, rows_in, removed['restaurant_id'].unique(), quarantine, new_screen,
+                           len(base)):
+        deltas = [os.path.basename(f) for f in delta_files(path, base_hash)]
+        base = publish_snapshot(base, snapshot, quarantine, new_screen, deltas)
+    df = with_costs(base, convert(base, factors))
+    removed = with_costs(removed, convert(removed, factors))
+    added = with_costs(rows_in, convert(rows_in, factors))
+
+    fingerprint = _fingerprint(path)
+    index = FilterIndex(df)
+    with _lock:
+        _bases[path] = (_source_fingerprint(path), base)
+        _cache[path] = (fingerprint, df)
+        _indexes[path] = (fingerprint, index)
+        _quarantines[path] = (fingerprint, with_costs(quarantine, convert(quarantine, factors)))
+        for key in [key for key in _selections if key[0] == path]:
+            del _selections[key]
+        for key in [key for key in _aggregates_cache if key[:2] == (path, old_fingerprint)]:
+            aggregates = _aggregates_cache.pop(key)
+            if aggregates.stats is None:
+                #recorte do cubo: é refeito na próxima consulta
+                continue
+            countries, cost_range, rating_range = key[3:]
+            filters = dict(countries=countries, cost_range=cost_range, rating_range=rating_range,
+                           columns=AGGREGATE_COLUMNS)
+            aggregates = aggregates.update(apply_filters(removed, **filters), apply_filters(added, **filters),
+                                           apply_filters(df, index=index, **filters))
+            _aggregates_cache[(path, fingerprint) + key[2:]] = aggregates
+
+    return len(delta)
+
+def clear_cache():
+    with _lock:
+        _cache.clear()
+        _bases.clear()
+        _costs.clear()
+        _indexes.clear()
+        _catalogs.clear()
+        _geo_bins.clear()
+        _quarantines.clear()
+        _screens.clear()
+        _aggregates_cache.clear()
+        _selections.clear()
@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+
+# =========================================================================
+# Triagem de outliers do preço médio para dois, por país e moeda
+# =========================================================================
+
+#O custo vem na moeda local, então só são comparados restaurantes do mesmo país e da mesma moeda.
+#Dentro do grupo a cotação é um fator comum, então a triagem usa o custo local e não depende dela.
+OUTLIER_GROUP = ['country_name', 'currency']
+OUTLIER_COLUMN = 'average_cost_for_two'
+
+#Largura das faixas do histograma de log(1 + custo) de cada grupo
+OUTLIER_BIN = 0.01
+
+#z robusto (distância à mediana do log do custo, em MADs) acima do qual a linha vai para a quarentena.
+#Os restaurantes mais caros do export ficam abaixo de 8; o custo de R$123mi da linha 356 dá 30.
+OUTLIER_Z = 10.0
+
+#Escala mínima, em log, para grupos com quase todos os preços iguais (MAD perto de zero)
+MIN_SCALE = 0.25
+
+#Grupos menores que isso não têm mediana confiável e não são avaliados
+MIN_GROUP_ROWS = 20
+
+def _weighted_median(values, weights):
+    order = np.argsort(values, kind='stable')
+    cumulative = np.cumsum(weights[order])
+    return values[order][np.searchsorted(cumulative, cumulative[-1] / 2)]
+
+#Histograma do log do custo por grupo. Só o lado de cima é triado: custo zero é "não informado" no
+#export, e tirar essas linhas mudaria as contagens de restaurantes das páginas.
+#Como PartialAggregates, dois histogramas de blocos se combinam com merge(); os limites saem só do
+#histograma, então a triagem em blocos marca exatamente as mesmas linhas que a do DataFrame inteiro.
+#O custo é linear no número de linhas e o histograma tem no máximo grupos x faixas entradas.
+class OutlierScreen:
+
+    def __init__(self, counts):
+        self.counts = counts
+        self._limits = None
+
+    @classmethod
+    def from_frame(cls, df):
+        bins = np.floor(np.log1p(df[OUTLIER_COLUMN].to_numpy()) / OUTLIER_BIN)
+        keys = [df[col] for col in OUTLIER_GROUP] + [pd.Series(bins, index=df.index, name='bin')]
+        counts = pd.Series(1, index=df.index).groupby(keys, observed=True).sum()
+        return cls(counts)
+
+    def merge(self, other):
+        return OutlierScreen(self.counts.add(other.counts, fill_value=0))
+
+    #Histograma depois de trocar as linhas removed pelas added (ex.: um delta): as contagens são
+    #invertíveis, então não é preciso refazer o histograma do dataset inteiro
+    def update(self, removed, added):
+        counts = self.counts.sub(OutlierScreen.from_frame(removed).counts, fill_value=0)
+        counts = counts.add(OutlierScreen.from_frame(added).counts, fill_value=0)
+        return OutlierScreen(counts[counts != 0].astype(int))
+
+    #Grupos (país, moeda) cujo limite é diferente em other
+    def changed_groups(self, other):
+        limits = pd.concat([self.limits(), other.limits()], axis=1)
+        changed = limits[0].ne(limits[1]) & ~(limits[0].isna() & limits[1].isna())
+        return limits.index[changed.to_numpy()]
+
+    #Limite superior do log do custo em cada grupo avaliado
+    def limits(self):
+        if self._limits is None:
+            limits = {}
+            for group, counts in self.counts.groupby(level=OUTLIER_GROUP):
+                weights = counts.to_numpy()
+                if weights.sum() < MIN_GROUP_ROWS:
+                    continue
+                centers = (counts.index.get_level_values('bin').to_numpy() + 0.5) * OUTLIER_BIN
+                median = _weighted_median(centers, weights)
+                mad = _weighted_median(np.abs(centers - median), weights)
+                limits[group] = median + OUTLIER_Z * max(1.4826 * mad, MIN_SCALE)
+            index = pd.MultiIndex.from_tuples(list(limits), names=OUTLIER_GROUP)
+            self._limits = pd.Series(list(limits.values()), index=index, dtype=float)
+        return self._limits
+
+    #Máscara das linhas de df acima do limite do seu grupo
+    def flags(self, df):
+        limits = self.limits()
+        if len(df) == 0 or len(limits) == 0:
+            return np.zeros(len(df), dtype=bool)
+        keys = pd.MultiIndex.from_arrays([df[col].to_numpy(dtype=object) for col in OUTLIER_GROUP])
+        limit = limits.reindex(keys).to_numpy()
+        return np.log1p(df[OUTLIER_COLUMN].to_numpy()) > limit
+
+#Máscara das linhas de df que pertencem a um dos grupos (país, moeda)
+def group_mask(df, groups):
+    if len(groups) == 0:
+        return np.zeros(len(df), dtype=bool)
+    keys = pd.MultiIndex.from_arrays([df[col].to_numpy(dtype=object) for col in OUTLIER_GROUP])
+    return keys.isin(groups)
+
+#Separa o dataset em (linhas mantidas, quarentena). A quarentena é uma tabela à parte, com as mesmas
+#colunas, gravada ao lado do snapshot para conferência.
+def split_outliers(df, screen=None):
+    if screen is None:
+        screen = OutlierScreen.from_frame(df)
+    flags = screen.flags(df)
+    return df.loc[~flags].reset_index(drop=True), df.loc[flags].reset_index(drop=True)
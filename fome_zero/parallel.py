@@ -0,0 +1,109 @@
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+from fome_zero.cleaning import (DEDUP_KEY, build_dataset, code_cleaning, enrich, finalize_dataset,
+                                record_build_duplicates, rename_columns, row_hashes)
+from fome_zero.schema import apply_schema
+from fome_zero.sources import source_files, source_size
+
+# =========================================================================
+# Ingestão paralela: shards (ou pedaços de um CSV grande) limpos em um pool de processos
+# =========================================================================
+
+#Abaixo desse tamanho o custo de subir o pool não compensa e a leitura é serial
+PARALLEL_THRESHOLD_BYTES = 64 * 1024 ** 2
+
+#Tamanho alvo de cada pedaço quando um CSV único é dividido entre os workers
+PART_BYTES = 64 * 1024 ** 2
+
+SCAN_BLOCK_BYTES = 8 * 1024 ** 2
+
+#Offsets de fim de registro próximos de cada alvo. Endereços com quebra de linha entre aspas ocupam
+#mais de uma linha no CSV, então só contam as quebras com um número par de aspas antes delas.
+def record_boundaries(path, targets):
+    targets = sorted(targets)
+    boundaries = []
+    quotes = 0
+    offset = 0
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(SCAN_BLOCK_BYTES), b''):
+            buf = np.frombuffer(block, dtype=np.uint8)
+            parity = (quotes + np.cumsum(buf == ord('"'))) % 2
+            newlines = np.flatnonzero((buf == ord('\n')) & (parity == 0)) + offset
+            while targets and newlines.size and newlines[-1] >= targets[0]:
+                boundary = int(newlines[np.searchsorted(newlines, targets[0])]) + 1
+                boundaries.append(boundary)
+                targets = [t for t in targets if t >= boundary]
+            quotes += int(np.count_nonzero(buf == ord('"')))
+            offset += len(buf)
+            if not targets:
+                break
+    return boundaries
+
+#Tarefas do pool: (arquivo, início, fim) em bytes; início None lê o arquivo inteiro com cabeçalho
+def plan_tasks(csv_path, part_bytes=PART_BYTES):
+    tasks = []
+    for path in source_files(csv_path):
+        size = os.path.getsize(path)
+        parts = max(1, size // part_bytes)
+        if parts == 1:
+            tasks.append((path, None, None))
+            continue
+        header_end = record_boundaries(path, [0])[0]
+        targets = [header_end + (size - header_end) * i // parts for i in range(1, parts)]
+        bounds = [header_end] + record_boundaries(path, targets) + [size]
+        bounds = sorted(set(bounds))
+        tasks += [(path, start, end) for start, end in zip(bounds, bounds[1:])]
+    return tasks
+
+def _read_task(task):
+    path, start, end = task
+    if start is None:
+        return pd.read_csv(path)
+    names = pd.read_csv(path, nrows=0).columns
+    with open(path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    return pd.read_csv(io.BytesIO(data), header=None, names=names)
+
+#Executado em cada worker: limpeza e enriquecimento do pedaço, mais os hashes para a deduplicação global
+#e o número de duplicatas removidas (os contadores do worker ficam no processo dele)
+def _clean_task(task, key=DEDUP_KEY):
+    df = _read_task(task).dropna()
+    hashes = row_hashes(df, key)
+    keep = ~pd.Series(hashes).duplicated().to_numpy()
+    df = code_cleaning(df.loc[keep], key)
+    df = apply_schema(rename_columns(enrich(df)))
+    return df, hashes[keep], len(keep) - int(keep.sum())
+
+#Limpa os pedaços em paralelo e junta na ordem original; o drop_duplicates global mantém a primeira
+#ocorrência, como o drop_duplicates de code_cleaning faria no arquivo inteiro
+def build_parallel(csv_path, workers=None, part_bytes=PART_BYTES, key=DEDUP_KEY):
+    tasks = plan_tasks(csv_path, part_bytes)
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    if workers == 1:
+        #com um só núcleo o pool só adiciona custo de processo e de serialização
+        results = [_clean_task(task, key) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(partial(_clean_task, key=key), tasks))
+
+    df = pd.concat([part for part, _, _ in results], ignore_index=True)
+    hashes = np.concatenate([part_hashes for _, part_hashes, _ in results])
+    keep = ~pd.Series(hashes).duplicated().to_numpy()
+    df = df.loc[keep].reset_index(drop=True)
+    record_build_duplicates(sum(removed for _, _, removed in results) + len(keep) - int(keep.sum()))
+
+    return finalize_dataset(df)
+
+#Constrói o dataset tratado a partir de um CSV ou diretório de shards, em paralelo quando compensa
+def build_source(csv_path, workers=None, key=DEDUP_KEY):
+    files = source_files(csv_path)
+    if len(files) == 1 and (source_size(csv_path) < PARALLEL_THRESHOLD_BYTES or os.cpu_count() == 1):
+        return build_dataset(pd.read_csv(files[0]), key)
+    return build_parallel(csv_path, workers, key=key)
@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+
+# =========================================================================
+# Rankings parciais (top-k / bottom-k) dos gráficos de melhores e piores
+# =========================================================================
+
+#Chaves de desempate: as colunas indicadas ou, por padrão, os níveis do índice (o grão do agregado)
+def _tie_keys(df, tie_break):
+    if tie_break is None:
+        return [df.index.get_level_values(level).to_numpy() for level in range(df.index.nlevels)]
+    return [df[col].to_numpy() for col in tie_break]
+
+#As k linhas com os maiores valores de col (os menores, com ascending=True), já em ordem. O
+#np.argpartition separa os candidatos em O(n) e só eles, mais os empatados no limite, são ordenados.
+#Empates são desfeitos pelas chaves de desempate em ordem crescente e depois pela posição da linha,
+#então o resultado não depende do algoritmo de ordenação. Valores NaN ficam de fora.
+def top_k(df, col, k, ascending=False, tie_break=None):
+    if k <= 0:
+        return df.iloc[:0]
+    values = df[col].to_numpy(dtype=float)
+    positions = np.flatnonzero(~np.isnan(values))
+    scores = values[positions] if ascending else -values[positions]
+
+    if k < len(positions):
+        kth = scores[np.argpartition(scores, k - 1)[k - 1]]
+        candidates = scores <= kth
+        positions, scores = positions[candidates], scores[candidates]
+
+    ties = [pd.factorize(key[positions], sort=True)[0] for key in _tie_keys(df, tie_break)]
+    order = np.lexsort([positions] + ties[::-1] + [scores])[:k]
+    return df.iloc[positions[order]]
+
+def bottom_k(df, col, k, tie_break=None):
+    return top_k(df, col, k, ascending=True, tie_break=tie_break)
@@ -0,0 +1,50 @@
+# =========================================================================
+# Schema compacto do DataFrame tratado (nomes de coluna já em snake_case)
+# =========================================================================
+
+#Textos com poucos valores distintos viram categóricos; textos livres ficam em strings do Arrow.
+#aggregate_rating e average_cost_for_two_brl continuam float64: em float32 um 4.6 vira 4.5999999
+#e os filtros de faixa (between) dos sliders deixariam de fora as linhas exatamente no limite.
+SCHEMA = {
+    'restaurant_id': 'int32',
+    'restaurant_name': 'string[pyarrow]',
+    'country_code': 'int16',
+    'city': 'category',
+    'address': 'string[pyarrow]',
+    'locality': 'string[pyarrow]',
+    'locality_verbose': 'string[pyarrow]',
+    'longitude': 'float32',
+    'latitude': 'float32',
+    'cuisines': 'category',
+    'average_cost_for_two': 'int32',
+    'currency': 'category',
+    'has_table_booking': 'int8',
+    'has_online_delivery': 'int8',
+    'is_delivering_now': 'int8',
+    'price_range': 'int8',
+    'aggregate_rating': 'float64',
+    'rating_color': 'category',
+    'rating_text': 'category',
+    'votes': 'int32',
+    'country_name': 'category',
+    'price_category': 'category',
+    'rating_color_name': 'category',
+    'average_cost_for_two_brl': 'float64',
+}
+
+def apply_schema(df):
+    dtypes = {col: dtype for col, dtype in SCHEMA.items() if col in df.columns}
+    return df.astype(dtypes)
+
+#Bytes por linha do DataFrame, contando o conteúdo das strings
+def memory_per_row(df):
+    if len(df) == 0:
+        return 0.0
+    return df.memory_usage(deep=True).sum() / len(df)
+
+#O plotly.express faz groupby interno em color/path sem observed=True e, com colunas categóricas,
+#gera combinações vazias (ex.: Qatar/Cheap com 0). Os agregados que vão para o gráfico são pequenos,
+#então voltam a ser strings comuns antes do px
+def decategorize(df):
+    cols = df.select_dtypes('category').columns
+    return df.astype({col: object for col in cols})
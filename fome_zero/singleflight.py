@@ -0,0 +1,54 @@
+import threading
+
+# =========================================================================
+# Single-flight: chamadas concorrentes com a mesma chave compartilham uma única execução
+# =========================================================================
+
+class _Call:
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+#As sessões do Streamlit rodam em threads do mesmo processo. Quando várias pedem o mesmo estado dos
+#filtros ao mesmo tempo, a primeira calcula e as outras esperam e recebem o mesmo resultado (ou a
+#mesma exceção), em vez de repetir o cálculo em paralelo.
+class SingleFlight:
+
+    def __init__(self):
+        self.calls = 0
+        self.coalesced = 0
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func):
+        with self._lock:
+            self.calls += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def stats(self):
+        with self._lock:
+            return {'calls': self.calls, 'coalesced': self.coalesced, 'in_flight': len(self._calls)}
@@ -0,0 +1,216 @@
+import json
+import os
+import re
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+
+from fome_zero.cleaning import PIPELINE_VERSION
+from fome_zero.deltas import delta_files, read_deltas, upsert
+from fome_zero.outliers import OutlierScreen, split_outliers
+from fome_zero.parallel import build_source
+from fome_zero.schema import apply_schema
+from fome_zero.sources import file_hash
+
+# =========================================================================
+# Snapshot colunar (Parquet) do dataset tratado e cópia compartilhada (Arrow mapeado em memória)
+# =========================================================================
+
+SNAPSHOT_DIR = 'files/cache'
+
+#O nome do snapshot carrega o hash do export e a versão do pipeline de limpeza, então um export novo ou
+#uma mudança na limpeza apontam para um arquivo novo. Os deltas aplicados ficam no manifesto ao lado dele.
+#base_hash evita reler o export quando quem chama já tem o hash dele.
+def snapshot_path(csv_path, snapshot_dir=SNAPSHOT_DIR, base_hash=None):
+    stem = os.path.splitext(os.path.basename(os.path.normpath(csv_path)))[0]
+    base_hash = base_hash or file_hash(csv_path)
+    name = f'{stem}_{base_hash[:16]}_v{PIPELINE_VERSION}.parquet'
+    return os.path.join(snapshot_dir, name)
+
+def write_snapshot(df, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    #escrita atômica: outro processo nunca lê um arquivo pela metade
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+#Cópia do snapshot em Arrow IPC sem compressão, ao lado do Parquet
+def shared_path(path):
+    return os.path.splitext(path)[0] + '.arrow'
+
+def write_shared(df, path):
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with pa.OSFile(tmp_path, 'wb') as f:
+        with ipc.new_file(f, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, path)
+
+#Linhas em quarentena (outliers de preço) do snapshot, em Parquet ao lado dele
+def quarantine_path(path):
+    return os.path.splitext(path)[0] + '_quarantine.parquet'
+
+#Quarentena do snapshot atual; None se ela não foi gravada (ex.: deploy read-only)
+def read_quarantine(path):
+    try:
+        return apply_schema(pd.read_parquet(quarantine_path(path)))
+    except OSError:
+        return None
+
+#Histograma da triagem de outliers (base mais quarentena), atualizado a cada delta sem reler o dataset
+def screen_path(path):
+    return os.path.splitext(path)[0] + '_screen.parquet'
+
+def read_screen(path):
+    try:
+        counts = pd.read_parquet(screen_path(path))
+    except OSError:
+        return None
+    return OutlierScreen(counts.set_index(list(counts.columns[:-1]))['count'])
+
+def write_screen(screen, path):
+    write_snapshot(screen.counts.rename('count').reset_index(), screen_path(path))
+
+#Manifesto do snapshot: os deltas já incluídos no arquivo principal e os fragmentos acrescentados depois,
+#um por delta, cada um com as linhas novas (Arrow IPC) e os restaurant_id que ele tira das anteriores
+def manifest_path(path):
+    return os.path.splitext(path)[0] + '.json'
+
+def fragment_path(path, sequence):
+    return f'{os.path.splitext(path)[0]}_f{sequence:06d}.arrow'
+
+def read_manifest(path):
+    try:
+        with open(manifest_path(path)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def write_manifest(manifest, path):
+    tmp_path = f'{manifest_path(path)}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, manifest_path(path))
+
+#Deltas cobertos pelo snapshot, na ordem de aplicação
+def manifest_deltas(manifest):
+    return manifest['deltas'] + [fragment['delta'] for fragment in manifest['fragments']]
+
+#Linhas de fragmento ainda em memória: as de um fragmento somem das anteriores com os restaurant_id que
+#ele tira; as do arquivo principal são filtradas uma vez só, pela união de todos os restaurant_id tirados
+def apply_fragments(df, path, fragments):
+    if not fragments:
+        return df
+    added = None
+    removed = set()
+    for fragment in fragments:
+        rows = map_shared(os.path.join(os.path.dirname(path), fragment['file']))
+        if added is not None:
+            added = added.loc[~added['restaurant_id'].isin(fragment['tombstones'])]
+        added = rows if added is None else pd.concat([added, rows], ignore_index=True)
+        removed.update(fragment['tombstones'])
+    kept = df.loc[~df['restaurant_id'].isin(removed)]
+    return apply_schema(pd.concat([kept, added], ignore_index=True))
+
+#Mapeia o arquivo Arrow em memória, somente leitura. As colunas numéricas, os códigos dos categóricos
+#e as strings do Arrow apontam direto para as páginas do arquivo, que o sistema operacional
+#compartilha entre todos os processos (workers do Streamlit, pool de processos) que mapeiam o mesmo
+#arquivo. Os dtypes já saem iguais ao SCHEMA: passar por apply_schema aqui faria uma cópia.
+def map_shared(path):
+    table = ipc.open_file(pa.memory_map(path)).read_all()
+    return table.to_pandas(split_blocks=True, types_mapper={pa.string(): pd.StringDtype('pyarrow')}.get)
+
+#Remove snapshots antigos do mesmo CSV (outro hash ou outra versão do pipeline)
+def remove_stale_snapshots(path):
+    snapshot_dir, name = os.path.split(path)
+    stem = name.rsplit('_', 2)[0]
+    keep = {name, os.path.basename(shared_path(path)), os.path.basename(quarantine_path(path))}
+    keep.update(os.path.basename(f(path)) for f in (screen_path, manifest_path))
+    pattern = re.compile(re.escape(stem) + r'_[0-9a-f]{16}_v\d+(_quarantine|_screen|_f\d{6})?\.(parquet|arrow|json)')
+    for old_name in os.listdir(snapshot_dir):
+        if old_name not in keep and pattern.fullmatch(old_name):
+            try:
+                os.remove(os.path.join(snapshot_dir, old_name))
+            except OSError:
+                pass
+
+#Grava a quarentena, o histograma da triagem, o snapshot, a cópia compartilhada e o manifesto (sem
+#fragmentos; os de uma versão anterior são apagados) e devolve o DataFrame mapeado a partir da cópia.
+#deltas são os nomes dos deltas já incluídos em df.
+def publish_snapshot(df, path, quarantine, screen, deltas):
+    try:
+        write_snapshot(quarantine, quarantine_path(path))
+        write_screen(screen, path)
+        write_snapshot(df, path)
+        write_shared(df, shared_path(path))
+        write_manifest({'deltas': deltas, 'fragments': []}, path)
+        remove_stale_snapshots(path)
+    except OSError:
+        #sem permissão de escrita (ex.: deploy read-only): segue só com a versão em memória
+        return df
+    return map_shared(shared_path(path))
+
+#Fragmentos acumulados acima desta fração das linhas do dataset: o snapshot é regravado inteiro
+COMPACT_FRACTION = 0.1
+
+#Acrescenta um delta ao snapshot sem regravá-lo: rows são as linhas que entram no dataset das páginas,
+#tombstones os restaurant_id que saem dele (substituídos pelo delta ou levados para a quarentena).
+#A quarentena e o histograma, pequenos, são regravados; o manifesto é gravado por último, então um
+#leitor vê o fragmento inteiro ou não o vê. Retorna False se não houve como gravar ou se os fragmentos
+#passariam de COMPACT_FRACTION das total_rows linhas do dataset; aí quem chama publica o snapshot.
+def append_fragment(path, delta, rows, tombstones, quarantine, screen, total_rows):
+    manifest = read_manifest(path)
+    if manifest is None:
+        return False
+    pending = sum(fragment['rows'] + len(fragment['tombstones']) for fragment in manifest['fragments'])
+    if pending + len(rows) + len(tombstones) > COMPACT_FRACTION * total_rows:
+        return False
+    sequence = len(manifest['fragments']) + 1
+    try:
+        write_shared(rows, fragment_path(path, sequence))
+        write_snapshot(quarantine, quarantine_path(path))
+        write_screen(screen, path)
+        manifest['fragments'].append({'delta': delta, 'file': os.path.basename(fragment_path(path, sequence)),
+                                      'rows': len(rows), 'tombstones': [int(value) for value in tombstones]})
+        write_manifest(manifest, path)
+    except OSError:
+        return False
+    return True
+
+#Dataset do snapshot a partir do CSV: export limpo, deltas gravados aplicados e outliers separados.
+#Retorna (linhas mantidas, quarentena, histograma da triagem, nomes dos deltas aplicados), já prontos
+#para publish_snapshot em snapshot_path(csv_path).
+def build_snapshot(csv_path, base_hash=None):
+    df = build_source(csv_path)
+    files = delta_files(csv_path, base_hash)
+    delta = read_deltas(files)
+    if delta is not None:
+        df = upsert(df, delta)
+    screen = OutlierScreen.from_frame(df)
+    df, quarantine = split_outliers(df, screen)
+    return df, quarantine, screen, [os.path.basename(f) for f in files]
+
+#Mapeia a cópia compartilhada se ela estiver atualizada (com os fragmentos dos deltas acrescentados
+#depois); senão parte do Parquet ou reconstrói do CSV. O export é lido uma vez só para o hash.
+def load_snapshot(csv_path, snapshot_dir=SNAPSHOT_DIR):
+    base_hash = file_hash(csv_path)
+    path = snapshot_path(csv_path, snapshot_dir, base_hash)
+    deltas = [os.path.basename(f) for f in delta_files(csv_path, base_hash)]
+    manifest = read_manifest(path)
+    if manifest is not None and manifest_deltas(manifest) == deltas:
+        shared = shared_path(path)
+        if os.path.exists(shared):
+            return apply_fragments(map_shared(shared), path, manifest['fragments'])
+        if os.path.exists(path):
+            #o Parquet devolve as strings do Arrow como string[python]; o schema restaura os dtypes
+            df = apply_schema(pd.read_parquet(path))
+            try:
+                write_shared(df, shared)
+                df = map_shared(shared)
+            except OSError:
+                pass
+            return apply_fragments(df, path, manifest['fragments'])
+
+    df, quarantine, screen, deltas = build_snapshot(csv_path, base_hash)
+    return publish_snapshot(df, path, quarantine, screen, deltas)
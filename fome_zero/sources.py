@@ -0,0 +1,34 @@
+import glob
+import hashlib
+import os
+
+# =========================================================================
+# Fontes de dados: um CSV único ou um diretório com shards *.csv
+# =========================================================================
+
+#Arquivos da fonte, em ordem estável (a ordem define qual duplicata é mantida)
+def source_files(path):
+    if os.path.isdir(path):
+        return sorted(glob.glob(os.path.join(path, '*.csv')))
+    return [path]
+
+def source_size(path):
+    return sum(os.path.getsize(f) for f in source_files(path))
+
+#Fingerprint barato da fonte (tamanho + data de modificação de cada arquivo), sem ler o conteúdo
+def file_fingerprint(path):
+    fingerprint = []
+    for f in source_files(path):
+        stat = os.stat(f)
+        fingerprint.append((os.path.basename(f), stat.st_size, stat.st_mtime_ns))
+    return tuple(fingerprint)
+
+#Hash do conteúdo da fonte, lido em blocos para não carregar os arquivos inteiros na memória
+def file_hash(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    for f in source_files(path):
+        digest.update(os.path.basename(f).encode())
+        with open(f, 'rb') as source:
+            for block in iter(lambda: source.read(block_size), b''):
+                digest.update(block)
+    return digest.hexdigest()
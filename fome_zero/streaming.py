@@ -0,0 +1,153 @@
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from fome_zero.aggregates import AGGREGATE_COLUMNS, ALL_GRAINS, PartialAggregates
+from fome_zero.cleaning import DEDUP_KEY, code_cleaning, enrich, record_build_duplicates, rename_columns, row_hashes
+from fome_zero.deltas import delta_files, read_deltas
+from fome_zero.filters import apply_filters
+from fome_zero.fx import convert, load_rates, with_costs
+from fome_zero.outliers import OutlierScreen
+from fome_zero.schema import apply_schema
+from fome_zero.sources import file_fingerprint, source_files, source_size
+
+# =========================================================================
+# Leitura em blocos (out-of-core) para exports maiores que a memória
+# =========================================================================
+
+CHUNKSIZE = 100_000
+
+#Acima desse tamanho de arquivo as páginas agregam o CSV em blocos em vez de carregá-lo inteiro
+STREAMING_THRESHOLD_BYTES = int(os.environ.get('FOME_ZERO_STREAMING_BYTES', 2 * 1024 ** 3))
+
+def use_streaming(csv_path):
+    return source_size(csv_path) > STREAMING_THRESHOLD_BYTES
+
+def _iter_raw_chunks(csv_path, chunksize):
+    for path in source_files(csv_path):
+        yield from pd.read_csv(path, chunksize=chunksize)
+
+#Hashes de linha já vistos numa passada, em níveis de arrays uint64 ordenados: 8 bytes por linha, sem um
+#objeto Python por hash. A consulta é uma busca binária por nível; um nível novo só é fundido com o
+#anterior quando eles ficam de tamanhos parecidos, então há log(linhas) níveis.
+class SeenHashes:
+
+    def __init__(self):
+        self.levels = []
+
+    #as buscas são feitas com os hashes do bloco em ordem, que percorrem cada nível num sentido só
+    def contains(self, hashes):
+        order = np.argsort(hashes)
+        needles = hashes[order]
+        found = np.zeros(len(hashes), dtype=bool)
+        for level in self.levels:
+            positions = np.minimum(np.searchsorted(level, needles), len(level) - 1)
+            found |= level[positions] == needles
+        result = np.empty_like(found)
+        result[order] = found
+        return result
+
+    #hashes distintos entre si e fora do conjunto
+    def add(self, hashes):
+        if len(hashes) == 0:
+            return
+        level = np.sort(hashes)
+        while self.levels and len(self.levels[-1]) <= 2 * len(level):
+            level = np.sort(np.concatenate([self.levels.pop(), level]), kind='stable')
+        self.levels.append(level)
+
+#Linhas mantidas pela deduplicação em cada bloco, por fonte, tamanho de bloco e chave: a primeira passada
+#completa calcula e as seguintes (triagem, agregados, catálogo, mapa) só leem a máscara, sem refazer
+#os hashes. Um bit por linha (np.packbits) por bloco.
+_dedup_masks = {}
+_masks_lock = threading.Lock()
+
+#Gera blocos limpos, enriquecidos e renomeados, com o mesmo resultado de build_dataset no arquivo todo.
+#As duplicatas entre blocos são removidas pelo hash da linha; a máscara resultante é guardada em _dedup_masks.
+#Restaurantes presentes nos deltas são pulados no export base e entram no fim, na versão do delta.
+#Com screen (fit_screen), as linhas em quarentena são descartadas de cada bloco. O custo em BRL é
+#convertido bloco a bloco com as cotações vigentes. As duplicatas removidas são gravadas em dedup_report
+#só ao fim de uma passada completa.
+def iter_clean_chunks(csv_path, chunksize=CHUNKSIZE, screen=None, key=DEDUP_KEY):
+    factors = load_rates().factors()
+    delta = read_deltas(delta_files(csv_path))
+    replaced = delta['restaurant_id'] if delta is not None else []
+    mask_key = (os.path.abspath(csv_path), file_fingerprint(csv_path), chunksize, tuple(key))
+    masks = _dedup_masks.get(mask_key)
+    computed = [] if masks is None else None
+    seen = SeenHashes()
+    removed = 0
+    for i, chunk in enumerate(_iter_raw_chunks(csv_path, chunksize)):
+        chunk = chunk.dropna()
+
+        if masks is not None:
+            keep = np.unpackbits(masks[i], count=len(chunk)).astype(bool)
+        else:
+            hashes = row_hashes(chunk, key)
+            keep = ~pd.Series(hashes).duplicated().to_numpy()
+            keep &= ~seen.contains(hashes)
+            seen.add(hashes[keep])
+            removed += len(keep) - int(keep.sum())
+            computed.append(np.packbits(keep))
+
+        chunk = code_cleaning(chunk.loc[keep], key)
+        chunk = rename_columns(enrich(chunk))
+        chunk = apply_schema(chunk.loc[~chunk['restaurant_id'].isin(replaced)])
+        if screen is not None:
+            chunk = chunk.loc[~screen.flags(chunk)]
+
+        yield with_costs(chunk, convert(chunk, factors))
+    if computed is not None:
+        with _masks_lock:
+            for old in [old for old in _dedup_masks if old[0] == mask_key[0]]:
+                del _dedup_masks[old]
+            _dedup_masks[mask_key] = computed
+        record_build_duplicates(removed)
+
+    if delta is not None:
+        if screen is not None:
+            delta = delta.loc[~screen.flags(delta)]
+        yield with_costs(delta, convert(delta, factors))
+
+#Parciais combinados de uma vez por merge_partials
+MERGE_FAN_IN = 8
+
+#Combina os parciais dos blocos (PartialAggregates, GeoBins) em níveis: a cada MERGE_FAN_IN parciais de
+#um nível, eles viram um só (combine) no nível seguinte. O acumulado não é reagrupado a cada bloco, cada
+#linha é reagrupada log(blocos) vezes e só poucos parciais ficam na memória. A ordem dos blocos é mantida.
+def merge_partials(partials):
+    levels = []
+    for partial in partials:
+        level = 0
+        while True:
+            if level == len(levels):
+                levels.append([])
+            levels[level].append(partial)
+            if len(levels[level]) < MERGE_FAN_IN:
+                break
+            partial = type(partial).combine(levels[level])
+            levels[level] = []
+            level += 1
+    pending = [partial for level in reversed(levels) for partial in level]
+    if not pending:
+        return None
+    return pending[0] if len(pending) == 1 else type(pending[0]).combine(pending)
+
+#Histograma de triagem de outliers do CSV inteiro, montado bloco a bloco (uma passada a mais no arquivo)
+def fit_screen(csv_path, chunksize=CHUNKSIZE):
+    screen = None
+    for chunk in iter_clean_chunks(csv_path, chunksize):
+        partial = OutlierScreen.from_frame(chunk)
+        screen = partial if screen is None else screen.merge(partial)
+    return screen
+
+#Agrega o CSV bloco a bloco, aplicando os filtros da sidebar em cada bloco
+def aggregate_csv(csv_path, grains=ALL_GRAINS, countries=None, cost_range=None, rating_range=None,
+                  chunksize=CHUNKSIZE, screen=None):
+    if screen is None:
+        screen = fit_screen(csv_path, chunksize)
+    chunks = (apply_filters(chunk, countries, cost_range, rating_range, columns=AGGREGATE_COLUMNS)
+              for chunk in iter_clean_chunks(csv_path, chunksize, screen))
+    return merge_partials(PartialAggregates.from_frame(chunk, grains) for chunk in chunks).finalize()
@@ -0,0 +1,150 @@
+#importando bibliotecas
+import numpy as np
+import folium
+import streamlit as st
+from PIL import Image
+from streamlit_folium import st_folium
+from fome_zero import load_geo_bins
+
+st.set_page_config(page_title='Dashboard Mapa', page_icon='🗺️', layout='wide')
+
+# =========================================================================
+# Funções
+# =========================================================================
+
+ZOOM_INICIAL = 2
+CENTRO_INICIAL = (20.0, 30.0)
+
+#Margem desenhada além da área visível, em fração da altura e da largura dela: mover o mapa sem sair
+#dessa área não refaz os marcadores
+MARGEM_VISAO = 0.25
+
+#Uma feature GeoJSON por célula do mapa: o navegador recebe os marcadores já agrupados no servidor,
+#num GeoJson por tamanho de círculo, e não um folium.Marker por restaurante
+def camada_restaurantes(marcadores):
+    grupo = folium.FeatureGroup(name='Restaurantes')
+    raios = np.rint(5 + 4 * np.log10(marcadores['count'].to_numpy())).astype(int)
+    for raio in np.unique(raios):
+        features = []
+        for celula in marcadores.loc[raios == raio].itertuples(index=False):
+            if celula.restaurant_name is not None:
+                texto = f'<b>{celula.restaurant_name}</b><br>Nota: {celula.aggregate_rating:.1f}'
+            else:
+                texto = f'<b>{celula.count} restaurantes</b><br>Nota média: {celula.aggregate_rating:.2f}'
+            features.append({
+                'type': 'Feature',
+                'geometry': {'type': 'Point', 'coordinates': [celula.longitude, celula.latitude]},
+                'properties': {'texto': texto},
+            })
+        folium.GeoJson(
+            {'type': 'FeatureCollection', 'features': features},
+            marker=folium.CircleMarker(radius=int(raio), color='#CB202D', fill=True, fill_opacity=0.6, weight=1),
+            tooltip=folium.GeoJsonTooltip(fields=['texto'], labels=False),
+        ).add_to(grupo)
+    return grupo
+
+#zoom e limites ((sul, oeste), (norte, leste)) devolvidos pelo st_folium
+def visao_mapa(retorno):
+    limites = (retorno or {}).get('bounds') or {}
+    sudoeste = limites.get('_southWest') or {}
+    nordeste = limites.get('_northEast') or {}
+    bounds = None
+    if sudoeste.get('lat') is not None and nordeste.get('lat') is not None:
+        bounds = ((sudoeste['lat'], sudoeste['lng']), (nordeste['lat'], nordeste['lng']))
+    return {'zoom': (retorno or {}).get('zoom') or ZOOM_INICIAL, 'bounds': bounds}
+
+#Área com os marcadores desenhados para uma visão: os limites dela mais MARGEM_VISAO de cada lado
+def area_desenhada(visao):
+    if visao['bounds'] is None:
+        return {'zoom': visao['zoom'], 'bounds': None}
+    (sul, oeste), (norte, leste) = visao['bounds']
+    altura = (norte - sul) * MARGEM_VISAO
+    largura = (leste - oeste) * MARGEM_VISAO
+    bounds = ((sul - altura, oeste - largura), (norte + altura, leste + largura))
+    return {'zoom': visao['zoom'], 'bounds': bounds}
+
+#A visão cabe na área já desenhada: mesmo zoom e limites dentro dos dela
+def visao_coberta(visao, area):
+    if visao['zoom'] != area['zoom']:
+        return False
+    if area['bounds'] is None:
+        return True
+    if visao['bounds'] is None:
+        return False
+    (sul, oeste), (norte, leste) = visao['bounds']
+    (area_sul, area_oeste), (area_norte, area_leste) = area['bounds']
+    return sul >= area_sul and oeste >= area_oeste and norte <= area_norte and leste <= area_leste
+
+# =========================================================================
+# Header no Streamlit
+# =========================================================================
+
+st.title('🗺️ Dashboard Mapa')
+
+# =========================================================================
+# Sidebar no Streamlit
+# =========================================================================
+
+image_path = 'zomato_logo.png'
+image = Image.open(image_path)
+
+st.markdown(
+    """
+    <style>
+        [data-testid=stSidebar] [data-testid=stImage]{
+            text-align: center;
+            display: block;
+            margin-left: auto;
+            margin-right: auto;
+            width: 100%;
+        }
+    </style>
+    """, unsafe_allow_html=True
+)
+
+st.sidebar.image(image, width=160)
+
+st.sidebar.markdown("""---""")
+
+# =========================================================================
+# Filtros no Streamlit
+# =========================================================================
+
+country_list = ['Philippines', 'Brazil', 'Australia', 'United States of America', 'Canada',
+                'Singapure', 'United Arab Emirates', 'India', 'Indonesia', 'New Zeland',
+                'England', 'Qatar', 'South Africa', 'Sri Lanka', 'Turkey']
+
+country_selection = st.sidebar.multiselect(
+    label='Selecione os países:',
+    options=country_list,
+    default=country_list
+)
+
+st.sidebar.markdown("""---""")
+
+st.sidebar.markdown('## Criado por Rodolfo Stremel')
+
+# =========================================================================
+# Layout no Streamlit
+# =========================================================================
+
+#área desenhada na última execução (zoom e limites com a margem), guardada pela página
+area = st.session_state.get('area_mapa', area_desenhada(visao_mapa(None)))
+
+with st.container():
+    st.markdown('### Restaurantes no Mapa')
+    st.markdown('###### Cada círculo agrupa os restaurantes próximos no zoom atual; aproxime para separá-los.')
+
+    #só as células da área, no tamanho do zoom atual, saem do servidor
+    marcadores = load_geo_bins().markers(area['zoom'], area['bounds'], countries=country_selection)
+
+    mapa = folium.Map(location=CENTRO_INICIAL, zoom_start=ZOOM_INICIAL)
+    retorno = st_folium(mapa, key='mapa', width=1200, height=600, returned_objects=['zoom', 'bounds'],
+                        feature_group_to_add=camada_restaurantes(marcadores))
+
+#o mapa mudou de zoom ou saiu da área desenhada: refaz os marcadores para a nova visão. Movimentos
+#dentro da margem não executam a página de novo.
+visao = visao_mapa(retorno)
+if not visao_coberta(visao, area):
+    st.session_state['area_mapa'] = area_desenhada(visao)
+    st.experimental_rerun()
@@ -0,0 +1,20 @@
+import os
+import shutil
+
+import pytest
+
+from fome_zero import loader
+from fome_zero.loader import clear_cache
+
+DATASET_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'files', 'dataset')
+
+#Cada teste roda num diretório próprio, com uma cópia do export e das cotações e sem cache
+@pytest.fixture
+def export(tmp_path, monkeypatch):
+    os.makedirs(tmp_path / 'files' / 'dataset')
+    for name in ('zomato.csv', 'fx_rates.csv'):
+        shutil.copy(os.path.join(DATASET_DIR, name), tmp_path / 'files' / 'dataset' / name)
+    monkeypatch.chdir(tmp_path)
+    clear_cache()
+    yield os.path.abspath(loader.CSV_PATH)
+    clear_cache()
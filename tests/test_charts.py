@@ -0,0 +1,56 @@
+import glob
+import os
+import runpy
+import shutil
+
+import numpy as np
+import plotly.express as px
+import pytest
+
+import fome_zero
+from fome_zero.charts import bar_chart
+
+# =========================================================================
+# bar_chart: a mesma figura (fig.to_dict()) que o px.bar com os mesmos argumentos, em cada página
+# =========================================================================
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+#páginas com gráficos de barras
+PAGES = sorted(os.path.relpath(path, ROOT) for path in glob.glob(os.path.join(ROOT, 'pages', '*.py'))
+               if 'bar_chart(' in open(path, encoding='utf-8').read())
+
+#Figura montada pelo caminho original: px.bar e os update_traces/update_xaxes das páginas
+def px_bar(df, x, y, labels=None, color=None, text_auto=False, custom_data=None, height=None,
+           traces=None, xaxes=None):
+    fig = px.bar(df, x=x, y=y, color=color, labels=labels, text_auto=text_auto, custom_data=custom_data,
+                 height=height)
+    fig.update_traces(**(traces or {}))
+    fig.update_xaxes(**(xaxes or {}))
+    return fig
+
+#Arrays viram listas: o px guarda parte das colunas como lista e o bar_chart como array
+def _plain(value):
+    if isinstance(value, np.ndarray):
+        return _plain(value.tolist())
+    if isinstance(value, dict):
+        return {key: _plain(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_plain(item) for item in value]
+    return value
+
+@pytest.mark.parametrize('page', PAGES)
+def test_page_charts_match_px(export, monkeypatch, page):
+    shutil.copy(os.path.join(ROOT, 'zomato_logo.png'), 'zomato_logo.png')
+    shutil.copytree(os.path.join(ROOT, 'pages'), 'pages')
+
+    calls = []
+    def recording_bar_chart(df, x, y, **kwargs):
+        fig = bar_chart(df, x, y, **kwargs)
+        calls.append((fig, px_bar(df, x, y, **kwargs)))
+        return fig
+    monkeypatch.setattr(fome_zero, 'bar_chart', recording_bar_chart)
+
+    runpy.run_path(page, run_name='__main__')
+    assert calls
+    for fig, expected in calls:
+        assert _plain(fig.to_dict()) == _plain(expected.to_dict())
@@ -0,0 +1,64 @@
+import pandas as pd
+import pytest
+
+from fome_zero import dedup_report, loader
+from fome_zero.cleaning import build_dataset
+from fome_zero.dedup import load_seen_rows
+from fome_zero.loader import apply_delta, load_dataset
+from fome_zero.snapshot import build_snapshot
+
+# =========================================================================
+# Deduplicação: contadores do dedup_report e chave configurável
+# =========================================================================
+
+#Duplicatas exatas do zomato.csv do repositório
+EXPORT_DUPLICATES = 583
+
+@pytest.fixture(autouse=True)
+def report(monkeypatch):
+    for name in dedup_report:
+        monkeypatch.setitem(dedup_report, name, 0)
+    return dedup_report
+
+def _write(df, tmp_path, name):
+    df.to_csv(tmp_path / name, index=False)
+    return str(tmp_path / name)
+
+def test_build_and_delta_counters_are_separate(export, tmp_path, report):
+    load_dataset(export)
+    assert report['build_duplicates'] == EXPORT_DUPLICATES
+
+    raw = pd.read_csv(loader.CSV_PATH).drop_duplicates('Restaurant ID')
+    changed = raw.iloc[:2].copy()
+    changed['Votes'] += 1
+    #uma linha repetida no delta e uma igual à do export
+    delta = _write(pd.concat([changed, changed.iloc[[0]], raw.iloc[[5]]]), tmp_path, 'delta.csv')
+
+    assert apply_delta(delta, export) == 2
+    assert report == {'build_duplicates': EXPORT_DUPLICATES, 'delta_duplicates': 1, 'already_ingested': 1}
+
+    #o delta reenviado é todo pulado
+    assert apply_delta(delta, export) == 0
+    assert report == {'build_duplicates': EXPORT_DUPLICATES, 'delta_duplicates': 2, 'already_ingested': 4}
+
+    #reconstruir o dataset grava as duplicatas do export de novo, sem somar as dos deltas
+    build_snapshot(export)
+    assert report['build_duplicates'] == EXPORT_DUPLICATES
+    assert report['delta_duplicates'] == 2
+
+def test_dedup_key_is_passed_through(export, report):
+    raw = pd.read_csv(loader.CSV_PATH)
+    key = ['Restaurant Name', 'City']
+    pd.testing.assert_frame_equal(build_dataset(raw.copy(), key), build_dataset(raw.copy()))
+    assert report['build_duplicates'] == EXPORT_DUPLICATES
+
+    seen = load_seen_rows(export, key)
+    assert len(seen.new_rows(raw, key)) == 0
+
+    #com a chave pelo nome, duas versões do mesmo restaurante viram uma só (a última)
+    first = raw.iloc[[0]].copy()
+    second = first.copy()
+    second['Votes'] += 1
+    second['Restaurant ID'] += 10 ** 8
+    new = seen.new_rows(pd.concat([first, second]), key)
+    assert new['Restaurant ID'].tolist() == second['Restaurant ID'].tolist()
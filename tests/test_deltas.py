@@ -0,0 +1,108 @@
+import os
+
+import pandas as pd
+
+from fome_zero import loader, snapshot
+from fome_zero.fx import COST_COLUMN
+from fome_zero.loader import apply_delta, clear_cache, load_dataset, load_quarantine
+from fome_zero.snapshot import build_snapshot, read_manifest, snapshot_path
+
+# =========================================================================
+# Deltas: aplicar, reenviar e comparar com o snapshot reconstruído do zero
+# =========================================================================
+
+def _raw():
+    return pd.read_csv(loader.CSV_PATH).drop_duplicates('Restaurant ID')
+
+def _sorted(df):
+    return df.sort_values('restaurant_id', ignore_index=True)
+
+#Dataset e quarentena em memória iguais aos de um snapshot montado do zero, com os deltas gravados
+def _assert_rebuilt(path):
+    df, quarantine, _, _ = build_snapshot(path)
+    pd.testing.assert_frame_equal(_sorted(load_dataset(path).drop(columns=COST_COLUMN)), _sorted(df))
+    pd.testing.assert_frame_equal(_sorted(load_quarantine(path).drop(columns=COST_COLUMN)), _sorted(quarantine))
+
+def _write(df, tmp_path, name):
+    df.to_csv(tmp_path / name, index=False)
+    return str(tmp_path / name)
+
+def _fragments(path):
+    return read_manifest(snapshot_path(path))['fragments']
+
+def test_apply_matches_rebuild(export, tmp_path):
+    load_dataset(export)
+    parquet = snapshot_path(export)
+    written = os.path.getmtime(parquet)
+
+    raw = _raw()
+    changed = raw.sample(40, random_state=1)
+    changed['Votes'] += 1000
+    changed['Aggregate rating'] = 4.9
+    new = raw.iloc[[10, 20]].copy()
+    new['Restaurant ID'] += 10 ** 8
+    delta = _write(pd.concat([changed, new]), tmp_path, 'delta.csv')
+
+    assert apply_delta(delta, export) == 42
+    _assert_rebuilt(export)
+
+    #o snapshot não é regravado: o delta vira um fragmento
+    assert os.path.getmtime(parquet) == written
+    assert len(_fragments(export)) == 1
+
+    #outro processo (cache vazio) monta o mesmo dataset a partir do snapshot e do fragmento
+    applied = load_dataset(export)
+    clear_cache()
+    pd.testing.assert_frame_equal(load_dataset(export), applied)
+
+def test_resent_delta_is_skipped(export, tmp_path):
+    changed = _raw().iloc[:5].copy()
+    changed['Votes'] += 1
+    delta = _write(changed, tmp_path, 'delta.csv')
+
+    assert apply_delta(delta, export) == 5
+    applied = load_dataset(export)
+    assert apply_delta(delta, export) == 0
+    pd.testing.assert_frame_equal(load_dataset(export), applied)
+    assert len(_fragments(export)) == 1
+
+    #o delta gravado continua valendo depois que o cache do processo some
+    clear_cache()
+    pd.testing.assert_frame_equal(load_dataset(export), applied)
+    _assert_rebuilt(export)
+
+def test_outliers_move_between_dataset_and_quarantine(export, tmp_path):
+    load_dataset(export)
+    raw = _raw()
+    qatar = raw.loc[raw['Country Code'] == raw.loc[raw['City'] == 'Doha', 'Country Code'].iloc[0]]
+
+    #restaurantes baratos novos derrubam a mediana do Qatar: os caros de antes vão para a quarentena
+    cheap = pd.concat([qatar] * 6, ignore_index=True)
+    cheap['Restaurant ID'] = range(10 ** 8, 10 ** 8 + len(cheap))
+    cheap['Average Cost for two'] = 1
+    assert apply_delta(_write(cheap, tmp_path, 'cheap.csv'), export) == len(cheap)
+    assert load_quarantine(export)['restaurant_id'].isin(qatar['Restaurant ID']).any()
+    _assert_rebuilt(export)
+
+    #com o preço corrigido eles voltam para o dataset
+    fixed = cheap.copy()
+    fixed['Average Cost for two'] = qatar['Average Cost for two'].median()
+    assert apply_delta(_write(fixed, tmp_path, 'fixed.csv'), export) == len(fixed)
+    assert not load_quarantine(export)['restaurant_id'].isin(qatar['Restaurant ID']).any()
+    _assert_rebuilt(export)
+
+    clear_cache()
+    _assert_rebuilt(export)
+
+def test_fragments_are_compacted(export, tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshot, 'COMPACT_FRACTION', 0.001)
+    load_dataset(export)
+    changed = _raw().iloc[:20].copy()
+    changed['Votes'] += 1
+
+    assert apply_delta(_write(changed, tmp_path, 'delta.csv'), export) == 20
+    manifest = read_manifest(snapshot_path(export))
+    assert manifest['fragments'] == [] and len(manifest['deltas']) == 1
+
+    clear_cache()
+    _assert_rebuilt(export)
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+
+from fome_zero.filters import FilterIndex, filter_mask, filter_state
+
+# =========================================================================
+# FilterIndex: mesmas linhas que a máscara, partindo ou não de um estado em cache
+# =========================================================================
+
+COUNTRIES = ['Brazil', 'India', 'Qatar', 'Turkey', 'England']
+
+def _frame(rows=5000):
+    rng = np.random.default_rng(7)
+    return pd.DataFrame({
+        'country_name': pd.Categorical(rng.choice(COUNTRIES, rows, p=[0.1, 0.6, 0.05, 0.1, 0.15])),
+        'average_cost_for_two_brl': rng.lognormal(4, 1, rows),
+        'aggregate_rating': np.round(rng.uniform(0, 4.9, rows), 1),
+    })
+
+def _expected(df, state):
+    mask = filter_mask(df, *state)
+    return np.arange(len(df)) if mask is None else np.flatnonzero(mask)
+
+def test_random_states_match_mask():
+    df = _frame()
+    index = FilterIndex(df)
+    rng = np.random.default_rng(1)
+    for _ in range(300):
+        countries = [None, list(rng.choice(COUNTRIES, 2, replace=False)), COUNTRIES][rng.integers(3)]
+        cost = [None, (10.0, 200.0), (0.0, 1e9), (50.0, 60.0)][rng.integers(4)]
+        rating = [None, (2.0, 4.0), (0.0, 5.0), (4.5, 4.9)][rng.integers(4)]
+        state = (countries, cost, rating)
+        positions = index.positions(*state)
+        if state == (None, None, None):
+            assert positions is None
+        else:
+            assert np.array_equal(positions, _expected(df, state)), state
+
+#Um slider mexido várias vezes parte do estado sem ele, qualquer que seja o filtro mais seletivo
+def test_moving_one_widget_reuses_the_other_filters():
+    df = _frame()
+    index = FilterIndex(df)
+    for countries in (None, ['Qatar', 'Turkey']):
+        for low in np.arange(0.0, 4.5, 0.25):
+            state = (countries, (20.0, 300.0), (float(low), 4.9))
+            assert np.array_equal(index.positions(*state), _expected(df, state)), state
+        assert filter_state(countries, (20.0, 300.0)) in index._stages
+
+        for high in (100.0, 150.0, 400.0, 1000.0):
+            state = (countries, (5.0, high), (1.0, 4.9))
+            assert np.array_equal(index.positions(*state), _expected(df, state)), state